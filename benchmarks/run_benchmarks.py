@@ -0,0 +1,301 @@
+"""Benchmarks of the ctg_viz preprocessing, report, categorization and plot functions on synthetic CTG-shaped data.
+
+Usage:
+    python benchmarks/run_benchmarks.py --rows 10k,100k,1M --output benchmarks/results/current.json
+    python benchmarks/run_benchmarks.py --rows 10k,100k --compare benchmarks/results/baseline.json
+
+Every case records its best wall time over --repeat runs, the peak memory traced by tracemalloc
+during one extra run (NumPy and pandas buffers included) and, for plots, the size of the figure
+payload (PNG bytes for matplotlib, JSON bytes for plotly). Results are stored as JSON together
+with the commit and library versions, and --compare prints the ratio against a stored run,
+flagging the cases slower than --threshold.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from ctg_viz import categorization, preprocessing, utils
+from ctg_viz.plots import aggregations, barplots, boxplots, density, heatmap, histograms, histograms_cat, line, scatter, violin
+
+# Numeric columns of CTG.csv, extra columns are named x0, x1, ...
+CTG_COLUMNS = ['b', 'e', 'LBE', 'LB', 'AC', 'FM', 'UC', 'ASTV', 'MSTV', 'ALTV', 'MLTV', 'DL', 'DS', 'DR',
+               'Width', 'Min', 'Max', 'Nmax', 'Nzeros', 'Mode', 'Mean', 'Median', 'Variance', 'Tendency']
+
+def synthetic_ctg(n_rows, n_columns=len(CTG_COLUMNS), n_categories=4, missing=0.01, seed=0) -> pd.DataFrame:
+    """CTG-shaped frame: continuous numeric columns, the DP category (n_categories levels) and the CLASS and NSP labels.
+
+    Args:
+        n_rows (int): Number of rows
+        n_columns (int, optional): Number of continuous numeric columns. Defaults to the CTG ones.
+        n_categories (int, optional): Levels of DP and CLASS. Defaults to 4.
+        missing (float, optional): Share of missing values in the numeric columns. Defaults to 0.01.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: Synthetic data
+    """
+    rng = np.random.default_rng(seed)
+    names = (CTG_COLUMNS + [f'x{i}' for i in range(max(n_columns - len(CTG_COLUMNS), 0))])[:n_columns]
+    dp = rng.integers(0, n_categories, n_rows)
+    values = rng.normal(size=(n_rows, n_columns)) * rng.uniform(1, 100, n_columns) + rng.uniform(0, 1000, n_columns)
+    # Shift by category so categories differ, and add a few outliers
+    values += dp[:, None] * rng.uniform(0, 10, n_columns)
+    values[rng.random((n_rows, n_columns)) < 0.001] *= 10
+    values[rng.random((n_rows, n_columns)) < missing] = np.nan
+
+    df = pd.DataFrame(values, columns=names)
+    df['DP'] = dp.astype('float64')
+    df['CLASS'] = np.array([f'C{i}' for i in range(n_categories)])[rng.integers(0, n_categories, n_rows)]
+    df['NSP'] = rng.integers(1, 4, n_rows).astype('float64')
+    return df
+
+class Case:
+    """A benchmarked call on the synthetic frame.
+
+    Args:
+        group (str): Module of the function
+        name (str): Name of the case
+        function (callable): Receives the frame (and the CSV path of the frame) and returns the result
+        max_rows (int, optional): Skip the case on larger frames. Defaults to None (never skipped).
+    """
+    def __init__(self, group, name, function, max_rows=None):
+        self.group = group
+        self.name = name
+        self.function = function
+        self.max_rows = max_rows
+
+    @property
+    def key(self) -> str:
+        return f'{self.group}.{self.name}'
+
+def _streaming_outliers(df, columns, method='iqr', chunk_rows=10_000, flag_only=False):
+    """Feed the frame to a StreamingOutlierFilter in chunks, as rows arriving from a stream."""
+    outlier_filter = preprocessing.StreamingOutlierFilter(columns, method, warmup_rows=None)
+    chunks = [df.iloc[start:start + chunk_rows] for start in range(0, df.shape[0], chunk_rows)]
+    if flag_only:
+        return pd.concat([outlier_filter.flag(chunk) for chunk in chunks])
+    return pd.concat([outlier_filter.filter(chunk) for chunk in chunks])
+
+def _cases(columns) -> list:
+    """Every benchmarked call. Cases whose cost grows with Python work per point are capped in rows."""
+    x, y = columns[0], columns[1]
+    corr_columns = columns[:24]
+    return [
+        Case('preprocessing', 'drop_columns_with_missing_values', lambda df, path: preprocessing.drop_columns_with_missing_values(df)),
+        Case('preprocessing', 'drop_columns_with_missing_values_csv', lambda df, path: preprocessing.drop_columns_with_missing_values_csv(path), max_rows=1_000_000),
+        Case('preprocessing', 'imput_values_median', lambda df, path: preprocessing.imput_values(df, 'median')),
+        Case('preprocessing', 'imput_values_mean', lambda df, path: preprocessing.imput_values(df, 'mean')),
+        Case('preprocessing', 'imput_values_median_parallel', lambda df, path: preprocessing.imput_values(df, 'median', n_jobs=-1)),
+        Case('preprocessing', 'imput_values_knn_fast', lambda df, path: preprocessing.imput_values(df, 'knn_fast'), max_rows=100_000),
+        Case('preprocessing', 'imput_values_knn', lambda df, path: preprocessing.imput_values(df, 'knn'), max_rows=10_000),
+        Case('preprocessing', 'ValueImputer.fit_transform', lambda df, path: preprocessing.ValueImputer('median').fit_transform(df)),
+        Case('preprocessing', 'remove_outliers_iqr', lambda df, path: preprocessing.remove_outliers(df, columns, 'iqr')),
+        Case('preprocessing', 'remove_outliers_zscore', lambda df, path: preprocessing.remove_outliers(df, columns, 'zscore')),
+        Case('preprocessing', 'remove_outliers_iqr_parallel', lambda df, path: preprocessing.remove_outliers(df, columns, 'iqr', n_jobs=-1)),
+        Case('preprocessing', 'StreamingOutlierFilter.flag', lambda df, path: _streaming_outliers(df, columns, 'iqr', flag_only=True), max_rows=1_000_000),
+        Case('preprocessing', 'StreamingOutlierFilter.filter_iqr', lambda df, path: _streaming_outliers(df, columns, 'iqr'), max_rows=1_000_000),
+        Case('preprocessing', 'StreamingOutlierFilter.filter_zscore', lambda df, path: _streaming_outliers(df, columns, 'zscore')),
+        Case('preprocessing', 'PreprocessingPipeline.run', lambda df, path: preprocessing.PreprocessingPipeline()
+             .drop_columns_with_missing_values(0.2).imput_values('median').remove_outliers(columns, 'iqr').run(df)),
+        Case('preprocessing', 'remove_outliers_sequential', lambda df, path: preprocessing.remove_outliers(df, columns, 'iqr', mode='sequential'), max_rows=1_000_000),
+        Case('utils', 'check_data_completeness', lambda df, path: utils.check_data_completeness_alejandro_sosa_murguia(df)),
+        Case('utils', 'check_data_completeness_parallel', lambda df, path: utils.check_data_completeness_alejandro_sosa_murguia(df, n_jobs=-1)),
+        Case('utils', 'check_data_completeness_approximate', lambda df, path: utils.check_data_completeness_alejandro_sosa_murguia(df, approximate_median=True)),
+        Case('utils', 'check_data_completeness_csv', lambda df, path: utils.check_data_completeness_csv(path), max_rows=1_000_000),
+        Case('categorization', 'classify_column_types', lambda df, path: categorization.classify_column_types(df, use_cache=False)),
+        Case('categorization', 'classify_column_types_parallel', lambda df, path: categorization.classify_column_types(df, use_cache=False, n_jobs=-1)),
+        Case('plots', 'histograms.histogram_matplotlib', lambda df, path: histograms.histogram_matplotlib(df[[x, y]].dropna(), [x, y], show_density=True, show_kde=True)),
+        Case('plots', 'histograms.histogram_seaborn', lambda df, path: histograms.histogram_seaborn(df, [x, y]), max_rows=1_000_000),
+        Case('plots', 'histograms.histogram_plotly', lambda df, path: histograms.histogram_plotly(df, [x, y], show_kde=True)),
+        Case('plots', 'histograms_cat.histogram_matplotlib', lambda df, path: histograms_cat.histogram_matplotlib(df, x, 'DP', show_kde=True)),
+        Case('plots', 'histograms_cat.histogram_seaborn', lambda df, path: histograms_cat.histogram_seaborn(df, x, 'DP', show_kde=True)),
+        Case('plots', 'histograms_cat.histogram_plotly', lambda df, path: histograms_cat.histogram_plotly(df, x, 'DP', show_kde=True)),
+        Case('plots', 'boxplots.boxplot_matplotlib', lambda df, path: boxplots.boxplot_matplotlib(df, x, 'DP')),
+        Case('plots', 'boxplots.boxplot_seaborn', lambda df, path: boxplots.boxplot_seaborn(df, x, 'DP')),
+        Case('plots', 'boxplots.boxplot_plotly', lambda df, path: boxplots.boxplot_plotly(df, x, 'DP'), max_rows=1_000_000),
+        Case('plots', 'barplots.barh_matplotlib', lambda df, path: barplots.barh_matplotlib(df, 'CLASS')),
+        Case('plots', 'barplots.barh_seaborn', lambda df, path: barplots.barh_seaborn(df, 'CLASS')),
+        Case('plots', 'barplots.barh_plotly', lambda df, path: barplots.barh_plotly(df, 'CLASS')),
+        Case('plots', 'line.line_matplotlib', lambda df, path: line.line_matplotlib(df, [x, y]), max_rows=1_000_000),
+        Case('plots', 'line.line_seaborn', lambda df, path: line.line_seaborn(df, [x, y]), max_rows=100_000),
+        Case('plots', 'line.line_plotly', lambda df, path: line.line_plotly(df, [x, y]), max_rows=1_000_000),
+        Case('plots', 'scatter.scatter_matplotlib', lambda df, path: scatter.scatter_matplotlib(df, x, y, 'DP')),
+        Case('plots', 'scatter.scatter_seaborn', lambda df, path: scatter.scatter_seaborn(df, x, y, 'DP'), max_rows=100_000),
+        Case('plots', 'scatter.scatter_plotly', lambda df, path: scatter.scatter_plotly(df, x, y, 'DP')),
+        Case('plots', 'density.density_matplotlib', lambda df, path: density.density_matplotlib(df, x, 'DP')),
+        Case('plots', 'density.density_seaborn', lambda df, path: density.density_seaborn(df, x, 'DP')),
+        Case('plots', 'density.density_plotly', lambda df, path: density.density_plotly(df, x, 'DP')),
+        Case('plots', 'violin.violin_matplotlib', lambda df, path: violin.violin_matplotlib(df, x, 'DP')),
+        Case('plots', 'violin.violin_seaborn', lambda df, path: violin.violin_seaborn(df, x, 'DP'), max_rows=1_000_000),
+        Case('plots', 'violin.violin_plotly', lambda df, path: violin.violin_plotly(df, x, 'DP'), max_rows=1_000_000),
+        Case('plots', 'heatmap.corr_heatmap_matplotlib', lambda df, path: heatmap.corr_heatmap_matplotlib(df, corr_columns)),
+        Case('plots', 'heatmap.corr_heatmap_seaborn', lambda df, path: heatmap.corr_heatmap_seaborn(df, corr_columns)),
+        Case('plots', 'heatmap.corr_heatmap_plotly', lambda df, path: heatmap.corr_heatmap_plotly(df, corr_columns, 'spearman')),
+    ]
+
+def _payload_size(result):
+    """Bytes of the figure a plot returns, None for other results."""
+    figure = result[0] if isinstance(result, tuple) else result
+    if isinstance(figure, Figure):
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format='png')
+        plt.close(figure)
+        return len(buffer.getvalue())
+    if isinstance(figure, go.Figure):
+        return len(figure.to_json())
+    return None
+
+def _run(case, df, path):
+    # Caches would turn every repeat after the first into a lookup
+    aggregations.clear_cache()
+    categorization.clear_classification_cache()
+    # The progress messages of the library are not part of the output
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = case.function(df, path)
+        seconds = time.perf_counter() - start
+    return seconds, result
+
+def run_case(case, df, path, repeat=3) -> dict:
+    """Best wall time, peak traced memory and payload size of a case.
+
+    Returns:
+        dict: 'seconds', 'peak_memory_bytes' and 'payload_bytes'
+    """
+    times = []
+    payload = None
+    for _ in range(repeat):
+        seconds, result = _run(case, df, path)
+        times.append(seconds)
+        payload = _payload_size(result)
+        del result
+
+    tracemalloc.start()
+    _, result = _run(case, df, path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    _payload_size(result)
+    return {'seconds': min(times), 'peak_memory_bytes': peak, 'payload_bytes': payload}
+
+def _parse_rows(text) -> list:
+    multipliers = {'k': 1_000, 'm': 1_000_000}
+    rows = []
+    for item in text.split(','):
+        item = item.strip().lower()
+        rows.append(int(float(item[:-1]) * multipliers[item[-1]]) if item[-1] in multipliers else int(item))
+    return rows
+
+def _metadata() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'matplotlib': matplotlib.__version__,
+    }
+
+def run_benchmarks(rows, n_columns=len(CTG_COLUMNS), n_categories=4, repeat=3, pattern=None) -> dict:
+    """Run every case (or those whose group.name matches pattern) on frames of each size.
+
+    Returns:
+        dict: 'metadata' and 'results', a list of dicts with case, rows, columns, categories and the measures
+    """
+    results = []
+    warmed_up = set()
+    for n_rows in rows:
+        df = synthetic_ctg(n_rows, n_columns, n_categories)
+        columns = [col for col in df.columns if col not in ['DP', 'CLASS', 'NSP']]
+        cases = [case for case in _cases(columns) if pattern is None or re.search(pattern, case.key)]
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'ctg.csv')
+            if any(case.key.endswith('_csv') and (case.max_rows is None or n_rows <= case.max_rows) for case in cases):
+                df.to_csv(path, index=False)
+            for case in cases:
+                if case.max_rows is not None and n_rows > case.max_rows:
+                    continue
+                if case.key not in warmed_up:
+                    # Lazy imports and first-use setup are not timed
+                    _payload_size(_run(case, df, path)[1])
+                    warmed_up.add(case.key)
+                measures = run_case(case, df, path, repeat)
+                results.append({'case': case.key, 'rows': n_rows, 'columns': n_columns, 'categories': n_categories, **measures})
+                print(f"{case.key:<55} {n_rows:>10} rows {measures['seconds']:>9.4f}s {measures['peak_memory_bytes'] / 2 ** 20:>9.1f} MiB")
+    return {'metadata': _metadata(), 'results': results}
+
+def compare(current, baseline, threshold=1.2) -> list:
+    """Cases measured in both runs whose time grew by more than threshold times.
+
+    Args:
+        current (dict): Output of run_benchmarks
+        baseline (dict): Stored output of run_benchmarks
+        threshold (float, optional): Slowdown ratio reported as a regression. Defaults to 1.2.
+
+    Returns:
+        list: (case, rows, ratio) of the regressions
+    """
+    def key(result):
+        return (result['case'], result['rows'], result['columns'], result['categories'])
+
+    previous = {key(result): result for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        if key(result) not in previous:
+            continue
+        ratio = result['seconds'] / previous[key(result)]['seconds']
+        flag = ' REGRESSION' if ratio > threshold else ''
+        print(f"{result['case']:<55} {result['rows']:>10} rows {ratio:>7.2f}x{flag}")
+        if ratio > threshold:
+            regressions.append((result['case'], result['rows'], ratio))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark ctg_viz functions on synthetic CTG-shaped data.')
+    parser.add_argument('--rows', default='10k,100k', help="Comma separated frame sizes, such as 10k,100k,1M,10M (default: '10k,100k')")
+    parser.add_argument('--columns', type=int, default=len(CTG_COLUMNS), help='Continuous numeric columns (default: the CTG ones)')
+    parser.add_argument('--categories', type=int, default=4, help='Levels of the category columns (default: 4)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case, the best is kept (default: 3)')
+    parser.add_argument('--filter', default=None, help='Only run cases whose module.function matches this regex')
+    parser.add_argument('--output', default=None, help='Write the results to this JSON file')
+    parser.add_argument('--compare', default=None, help='JSON results of a previous run to compare against')
+    parser.add_argument('--threshold', type=float, default=1.2, help='Slowdown ratio reported as a regression (default: 1.2)')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(_parse_rows(args.rows), args.columns, args.categories, args.repeat, args.filter)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
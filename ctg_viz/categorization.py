@@ -1,24 +1,114 @@
+import hashlib
 import pandas as pd
+import numpy as np
+from collections import OrderedDict
+from ctg_viz.instrumentation import instrumented, STATISTICS
+from ctg_viz.parallel import map_column_blocks
 
-def classify_column_types(df: pd.DataFrame) -> dict:
+# Results of classify_column_types keyed on the frame schema, shape and sampled content
+_CLASSIFICATION_CACHE = OrderedDict()
+_CLASSIFICATION_CACHE_SIZE = 32
+# Rows hashed by _sample_fingerprint
+FINGERPRINT_ROWS = 1024
+
+def _sample_fingerprint(df, n_rows=FINGERPRINT_ROWS) -> str:
+    """Hash of the index and values of n_rows evenly spaced rows of df, cheap to compute on every call."""
+    positions = np.unique(np.linspace(0, df.shape[0] - 1, min(df.shape[0], n_rows)).astype(np.int64))
+    row_hashes = pd.util.hash_pandas_object(df.iloc[positions], index=True).to_numpy()
+    return hashlib.blake2b(row_hashes.tobytes(), digest_size=16).hexdigest()
+
+def _has_more_unique_values(values, threshold, block_size=4096) -> bool:
+    """Check if an array has more than `threshold` distinct non-null values, stopping as soon as it does.
+
+    Args:
+        values (np.ndarray): 1D numeric array.
+        threshold (int): Number of distinct values to exceed.
+        block_size (int, optional): Rows scanned per step. Defaults to 4096.
+
+    Returns:
+        bool: True if there are more than threshold distinct values.
+    """
+    seen = np.empty(0, dtype=values.dtype)
+    for start in range(0, values.shape[0], block_size):
+        block = values[start:start + block_size]
+        block = block[~pd.isna(block)]
+        seen = np.unique(np.concatenate([seen, block]))
+        if seen.shape[0] > threshold:
+            return True
+    return False
+
+def _more_unique_values_block(values, threshold) -> np.ndarray:
+    """For every column of a 2D float array, whether it has more than `threshold` distinct non-null values."""
+    return np.array([_has_more_unique_values(values[:, i], threshold) for i in range(values.shape[1])], dtype=bool)
+
+def clear_classification_cache():
+    """Remove all cached results of classify_column_types."""
+    _CLASSIFICATION_CACHE.clear()
+
+@instrumented(STATISTICS)
+def classify_column_types(df: pd.DataFrame, threshold=10, sample_size=None, use_cache=False, n_jobs=1) -> dict:
     """Classify columns into categorical, continuous numerical, and discrete numerical.
 
+    The cardinality of each numeric column is checked once and the scan stops as soon as it passes
+    the threshold. With use_cache, results are kept for frames with the same column names, dtypes,
+    shape and content of a fixed sample of rows (see _sample_fingerprint). Changes outside the sampled
+    rows are not detected, so only use it on frames that are not modified, or call clear_classification_cache.
+
     Args:
         df (pd.DataFrame): Input dataframe.
+        threshold (int, optional): Numeric columns with more unique values than this are continuous. Defaults to 10.
+        sample_size (int, optional): Classify using a random sample of this many rows, for very large frames. Defaults to None (all rows).
+        use_cache (bool, optional): Reuse the result of a previous call on a frame with the same schema, shape and sampled rows. Defaults to False.
+        n_jobs (int, optional): Worker processes checking the cardinality of frames with many numeric columns, which are compared as float64. -1 uses all cores. Defaults to 1.
     Returns:
         dict: Dictionary with keys 'categorical', 'continuous_numerical', and 'discrete_numerical' containing lists of column names.
     """
-    
-    categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
-    numerical_cols = df.select_dtypes(include=['number']).columns.tolist()
+    if use_cache:
+        cache_key = (tuple(df.columns), tuple(map(str, df.dtypes)), df.shape, _sample_fingerprint(df), threshold, sample_size)
+    if use_cache and cache_key in _CLASSIFICATION_CACHE:
+        _CLASSIFICATION_CACHE.move_to_end(cache_key)
+        return {key: list(cols) for key, cols in _CLASSIFICATION_CACHE[cache_key].items()}
+
+    # Dtypes are selected on an empty slice, so the data is not copied
+    categorical_cols = df.iloc[:0].select_dtypes(include=['object', 'category']).columns.tolist()
+    numerical_cols = df.iloc[:0].select_dtypes(include=['number']).columns.tolist()
 
-    # Contiuous (more than 10 unique values with numeric type)
-    continuous_numerical_cols = [col for col in numerical_cols if df[col].nunique() > 10]
-    # Discretes (10 or less unique values with numeric type)
-    discrete_numerical_cols = [col for col in numerical_cols if df[col].nunique() <= 10]
+    sample_rows = None
+    if sample_size is not None and df.shape[0] > sample_size:
+        sample_rows = np.random.default_rng(0).choice(df.shape[0], size=sample_size, replace=False)
 
-    return {
+    # Contiuous (more than 10 unique values with numeric type), discretes (10 or less unique values with numeric type)
+    continuous_numerical_cols = []
+    discrete_numerical_cols = []
+    if n_jobs != 1:
+        sampled = df.iloc[sample_rows] if sample_rows is not None else df
+        blocks = map_column_blocks(_more_unique_values_block, sampled, numerical_cols, n_jobs, threshold=threshold)
+        is_continuous = np.concatenate(blocks).tolist() if blocks else []
+    else:
+        is_continuous = []
+        for col in numerical_cols:
+            column = df[col]
+            # Nullable extension dtypes (Int64, Float64) are converted so missing values become NaN
+            values = column.to_numpy() if isinstance(column.dtype, np.dtype) else column.to_numpy(dtype='float64', na_value=np.nan)
+            if sample_rows is not None:
+                values = values[sample_rows]
+            is_continuous.append(_has_more_unique_values(values, threshold))
+
+    for col, continuous in zip(numerical_cols, is_continuous):
+        if continuous:
+            continuous_numerical_cols.append(col)
+        else:
+            discrete_numerical_cols.append(col)
+
+    result = {
         'categorical': categorical_cols,
         'continuous_numerical': continuous_numerical_cols,
         'discrete_numerical': discrete_numerical_cols
     }
+
+    if use_cache:
+        _CLASSIFICATION_CACHE[cache_key] = {key: list(cols) for key, cols in result.items()}
+        if len(_CLASSIFICATION_CACHE) > _CLASSIFICATION_CACHE_SIZE:
+            _CLASSIFICATION_CACHE.popitem(last=False)
+
+    return result
@@ -0,0 +1,139 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from ctg_viz.categorization import classify_column_types
+from ctg_viz.instrumentation import instrumented, DATA_PREP
+
+class FilterIndex:
+    """Precomputed indexes of a dataframe to select rows by value ranges and categories.
+
+    Every range column is sorted once, so a range is two binary searches and a slice of row
+    positions. Every category column has its rows sorted by category once, the first time it is
+    filtered, so a set of categories is a few slices of row positions. Filters are combined with
+    bitwise AND on packed bitmaps (one bit per row) instead of building boolean masks over the
+    whole frame, and the rows of recent selections are memoized. Indexes take memory proportional
+    to the rows, whatever the number of categories.
+
+    Args:
+        df (pandas.DataFrame): Dataframe to filter. It must not be modified while the index is used.
+        range_columns (list, optional): Numeric columns filtered by range. Defaults to the continuous and discrete numerical columns.
+        category_columns (list, optional): Columns filtered by category. Defaults to the discrete numerical columns and the categorical columns with at most max_categories values.
+        cache_size (int, optional): Selections whose rows are memoized. Defaults to 64.
+        max_categories (int, optional): Categorical columns with more distinct values are left out of the default category columns. Defaults to 50.
+    """
+    def __init__(self, df, range_columns=None, category_columns=None, cache_size=64, max_categories=50):
+        if range_columns is None or category_columns is None:
+            column_types = classify_column_types(df)
+        if range_columns is None:
+            range_columns = column_types['continuous_numerical'] + column_types['discrete_numerical']
+        if category_columns is None:
+            # High-cardinality columns such as file names are not useful as filters
+            low_cardinality = [col for col in column_types['categorical'] if df[col].nunique() <= max_categories]
+            category_columns = low_cardinality + column_types['discrete_numerical']
+
+        self.df = df
+        self.n_rows = df.shape[0]
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+        # Row positions sorted by value, missing values left out
+        self._sorted = {}
+        for col in range_columns:
+            values = df[col].to_numpy(dtype='float64', na_value=np.nan)
+            order = np.argsort(values, kind='stable')
+            n_valid = self.n_rows - np.isnan(values).sum()
+            self._sorted[col] = (order[:n_valid], values[order[:n_valid]])
+
+        # Category indexes are built on first use
+        self.category_columns = list(category_columns)
+        self._groups = {}
+
+    def value_range(self, column) -> tuple:
+        """(min, max) of a range column, (nan, nan) if it has no values."""
+        sorted_values = self._sorted[column][1]
+        if sorted_values.shape[0] == 0:
+            return (np.nan, np.nan)
+        return (sorted_values[0], sorted_values[-1])
+
+    def _category_groups(self, column) -> tuple:
+        """(categories, position of each category, row positions sorted by category, start of each category) of a category column."""
+        if column not in self._groups:
+            if column not in self.category_columns:
+                raise KeyError(column)
+            codes, categories = pd.factorize(self.df[column])
+            order = np.argsort(codes, kind='stable')
+            # Rows with a missing category (code -1) sort first and belong to no category
+            bounds = np.searchsorted(codes[order], np.arange(len(categories) + 1))
+            categories = list(categories)
+            self._groups[column] = (categories, {category: code for code, category in enumerate(categories)}, order, bounds)
+        return self._groups[column]
+
+    def categories(self, column) -> list:
+        """Categories of a category column in order of appearance."""
+        return list(self._category_groups(column)[0])
+
+    def _range_bitmap(self, column, low, high) -> np.ndarray:
+        order, sorted_values = self._sorted[column]
+        start = np.searchsorted(sorted_values, low, side='left')
+        stop = np.searchsorted(sorted_values, high, side='right')
+        selected = np.zeros(self.n_rows, dtype=bool)
+        selected[order[start:stop]] = True
+        return np.packbits(selected)
+
+    def _category_bitmap(self, column, selected) -> np.ndarray:
+        _, codes, order, bounds = self._category_groups(column)
+        rows = np.zeros(self.n_rows, dtype=bool)
+        for category in selected:
+            code = codes.get(category)
+            if code is not None:
+                rows[order[bounds[code]:bounds[code + 1]]] = True
+        return np.packbits(rows)
+
+    @instrumented(DATA_PREP)
+    def rows(self, ranges=None, categories=None) -> np.ndarray:
+        """Positions of the rows matching every filter.
+
+        Args:
+            ranges (dict, optional): Maps range columns to inclusive (low, high) bounds. Defaults to None.
+            categories (dict, optional): Maps category columns to the list of categories to keep. Defaults to None.
+
+        Returns:
+            np.ndarray: Sorted row positions. Shared between calls, so it must not be modified.
+        """
+        ranges = ranges or {}
+        categories = categories or {}
+        key = (tuple(sorted((col, tuple(bounds)) for col, bounds in ranges.items())),
+               tuple(sorted((col, tuple(selected)) for col, selected in categories.items())))
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        bitmap = None
+        for col, selected in categories.items():
+            column_bitmap = self._category_bitmap(col, selected)
+            bitmap = column_bitmap if bitmap is None else bitmap & column_bitmap
+        for col, (low, high) in ranges.items():
+            column_bitmap = self._range_bitmap(col, low, high)
+            bitmap = column_bitmap if bitmap is None else bitmap & column_bitmap
+
+        if bitmap is None:
+            positions = np.arange(self.n_rows)
+        else:
+            positions = np.flatnonzero(np.unpackbits(bitmap, count=self.n_rows))
+
+        self._cache[key] = positions
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return positions
+
+    def filter(self, ranges=None, categories=None) -> pd.DataFrame:
+        """Rows of the dataframe matching every filter, see rows.
+
+        Returns:
+            pandas.DataFrame: Selected rows, the dataframe itself when no row is filtered out
+        """
+        positions = self.rows(ranges, categories)
+        if positions.shape[0] == self.n_rows:
+            return self.df
+        return self.df.iloc[positions]
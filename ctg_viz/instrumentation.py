@@ -0,0 +1,184 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from functools import wraps
+
+import pandas as pd
+
+# Phases of building a chart
+DATA_PREP = 'data_prep'
+STATISTICS = 'statistics'
+FIGURE_BUILD = 'figure_build'
+LAYOUT = 'layout'
+
+# Global registry, only written while enabled
+_ENABLED = False
+_STARTED_TRACEMALLOC = False
+_RECORDS = []
+_ORIGIN = time.perf_counter()
+_STACK = threading.local()
+
+def enable(memory=True):
+    """Start recording the timings of instrumented ctg_viz functions.
+
+    Args:
+        memory (bool, optional): Also record memory deltas with tracemalloc, which slows down Python-heavy code. Defaults to True.
+    """
+    global _ENABLED, _STARTED_TRACEMALLOC
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _STARTED_TRACEMALLOC = True
+    _ENABLED = True
+
+def disable():
+    """Stop recording. Records are kept until reset."""
+    global _ENABLED, _STARTED_TRACEMALLOC
+    _ENABLED = False
+    # Tracing started by someone else is left alone
+    if _STARTED_TRACEMALLOC:
+        tracemalloc.stop()
+        _STARTED_TRACEMALLOC = False
+
+def is_enabled() -> bool:
+    return _ENABLED
+
+def reset():
+    """Remove all records."""
+    _RECORDS.clear()
+
+def records() -> list:
+    """Copy of the records, each a dict with name, phase, start and seconds (from the first import), memory_delta (bytes or None), thread, depth and parent index."""
+    return list(_RECORDS)
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_PHASE = _NullPhase()
+
+class _Phase:
+    def __init__(self, name, phase):
+        self.name = name
+        self.phase = phase
+
+    def __enter__(self):
+        stack = getattr(_STACK, 'indexes', None)
+        if stack is None:
+            stack = _STACK.indexes = []
+        self.record = {
+            'name': self.name,
+            'phase': self.phase,
+            'start': time.perf_counter() - _ORIGIN,
+            'seconds': None,
+            'memory_delta': None,
+            'thread': threading.get_ident(),
+            'depth': len(stack),
+            'parent': stack[-1] if stack else None,
+        }
+        self.memory = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        _RECORDS.append(self.record)
+        stack.append(len(_RECORDS) - 1)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.record['seconds'] = time.perf_counter() - _ORIGIN - self.record['start']
+        if self.memory is not None and tracemalloc.is_tracing():
+            self.record['memory_delta'] = tracemalloc.get_traced_memory()[0] - self.memory
+        _STACK.indexes.pop()
+        return False
+
+def phase(name, phase=None):
+    """Context manager timing a block while instrumentation is enabled, and doing nothing otherwise.
+
+    Args:
+        name (str): Name of the block
+        phase (str, optional): One of DATA_PREP, STATISTICS, FIGURE_BUILD or LAYOUT. Defaults to None.
+    """
+    if not _ENABLED:
+        return _NULL_PHASE
+    return _Phase(name, phase)
+
+def instrumented(phase=None):
+    """Decorator timing every call of a function while instrumentation is enabled.
+
+    Args:
+        phase (str, optional): One of DATA_PREP, STATISTICS, FIGURE_BUILD or LAYOUT. Defaults to None.
+    """
+    def decorator(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _ENABLED:
+                return func(*args, **kwargs)
+            with _Phase(name, phase):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def summary() -> pd.DataFrame:
+    """Time per function and phase, excluding the time of the instrumented calls nested in each call.
+
+    Returns:
+        pd.DataFrame: Columns 'Name', 'Phase', 'Calls', 'Seconds', 'Self Seconds' and 'Memory Delta (MiB)', slowest first
+    """
+    columns = ['Name', 'Phase', 'Calls', 'Seconds', 'Self Seconds', 'Memory Delta (MiB)']
+    finished = [i for i, record in enumerate(_RECORDS) if record['seconds'] is not None]
+    if not finished:
+        return pd.DataFrame(columns=columns)
+
+    self_seconds = {i: _RECORDS[i]['seconds'] for i in finished}
+    for i in finished:
+        if _RECORDS[i]['parent'] in self_seconds:
+            self_seconds[_RECORDS[i]['parent']] -= _RECORDS[i]['seconds']
+    finished_records = [_RECORDS[i] for i in finished]
+
+    rows = pd.DataFrame({
+        'Name': [record['name'] for record in finished_records],
+        'Phase': [record['phase'] or '' for record in finished_records],
+        'Seconds': [record['seconds'] for record in finished_records],
+        'Self Seconds': [self_seconds[i] for i in finished],
+        'Memory Delta (MiB)': [record['memory_delta'] / 2 ** 20 if record['memory_delta'] is not None else float('nan') for record in finished_records],
+    })
+    report = rows.groupby(['Name', 'Phase'], sort=False).agg(
+        Calls=('Seconds', 'size'), Seconds=('Seconds', 'sum'), **{'Self Seconds': ('Self Seconds', 'sum'), 'Memory Delta (MiB)': ('Memory Delta (MiB)', 'sum')}
+    ).reset_index()
+    return report[columns].sort_values('Self Seconds', ascending=False, ignore_index=True)
+
+def phase_summary() -> pd.DataFrame:
+    """Self time per phase (data prep, statistics, figure build, layout).
+
+    Returns:
+        pd.DataFrame: Columns 'Phase' and 'Self Seconds'
+    """
+    report = summary()
+    return report.groupby('Phase', sort=False)['Self Seconds'].sum().reset_index()
+
+def to_json(path):
+    """Write the records to a JSON file."""
+    with open(path, 'w') as file:
+        json.dump(records(), file, indent=2)
+
+def to_chrome_trace(path):
+    """Write the records in the Chrome trace event format, to open with chrome://tracing or Perfetto."""
+    events = []
+    for record in _RECORDS:
+        if record['seconds'] is None:
+            continue
+        events.append({
+            'name': record['name'],
+            'cat': record['phase'] or 'function',
+            'ph': 'X',
+            'ts': record['start'] * 1e6,
+            'dur': record['seconds'] * 1e6,
+            'pid': os.getpid(),
+            'tid': record['thread'],
+            'args': {'memory_delta': record['memory_delta']},
+        })
+    with open(path, 'w') as file:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from ctg_viz.instrumentation import instrumented, DATA_PREP
+
+# Folder created next to the source file for the Parquet copies
+CACHE_DIR_NAME = '.ctg_viz_cache'
+# Key of the Parquet schema metadata holding the signature of the source file
+_SOURCE_KEY = b'ctg_viz_source'
+
+# Low-cardinality columns of the CTG data stored as category by the dashboard
+CTG_CATEGORY_COLUMNS = ['DP', 'CLASS', 'NSP']
+
+# Frames loaded by this process keyed on (path, read options), with the source signature they match
+_FRAMES = {}
+
+def _file_hash(path, block_size=1 << 20) -> str:
+    """Hex digest of the content of a file, read by blocks."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def file_signature(path, validate='mtime') -> list:
+    """Signature of a file that changes when the file changes.
+
+    Args:
+        path (str): Path to the file
+        validate (str, optional): 'mtime' uses modification time and size, 'hash' the content digest. Defaults to 'mtime'.
+
+    Returns:
+        list: JSON serializable signature
+    """
+    if validate not in ['mtime', 'hash']:
+        raise ValueError("Invalid validate. Possible values are 'mtime' or 'hash'")
+    if validate == 'hash':
+        return ['hash', _file_hash(path)]
+    stat = os.stat(path)
+    return ['mtime', stat.st_mtime_ns, stat.st_size]
+
+def _float_to_integer(values):
+    """Smallest integer array equal to a float array, or None if it has missing or non integer values."""
+    if values.size == 0 or not np.isfinite(values).all() or not (values == np.round(values)).all():
+        return None
+    if values.min() < np.iinfo(np.int64).min or values.max() > np.iinfo(np.int64).max:
+        return None
+    return pd.to_numeric(values.astype(np.int64), downcast='integer')
+
+def _float_to_float32(values, tolerance):
+    """Float32 copy of a float array if every value keeps a relative error under tolerance, else None."""
+    with np.errstate(over='ignore', invalid='ignore'):
+        compact = values.astype(np.float32)
+        error = np.abs(compact.astype(values.dtype) - values)
+        # NaN stays NaN, and a value out of the float32 range becomes inf and fails the check
+        safe = (error <= tolerance * np.abs(values)) | (np.isnan(values) & np.isnan(compact))
+    return compact if safe.all() else None
+
+def optimize_dtypes(df, category_columns=None, max_categories=50, float_tolerance=0.0, return_report=False) -> pd.DataFrame:
+    """Store every column with the smallest dtype that keeps its values.
+
+    Integer columns are downcast to the smallest integer type, float columns holding only
+    integers (and no missing values) too. Other float columns become float32 only when every
+    value is exactly representable, unless a float_tolerance is given (float32 keeps about 7
+    significant digits, so a tolerance such as 1e-6 converts nearly every column, losing precision).
+    Text columns with at most max_categories distinct values, and the category_columns, become
+    category. Columns that do not change are shared with df.
+
+    Args:
+        df (pd.DataFrame): Dataframe
+        category_columns (list, optional): Columns always converted to category, missing ones are ignored. Defaults to None.
+        max_categories (int, optional): Text columns with more distinct values are kept as they are. Defaults to 50.
+        float_tolerance (float, optional): Largest relative error accepted to store floats as float32, 0 accepts only exact values. Defaults to 0.0.
+        return_report (bool, optional): Return a (dataframe, report) tuple instead of printing the memory saved. Defaults to False.
+
+    Returns:
+        pd.DataFrame: Dataframe with compact dtypes (and, with return_report, a dataframe with the dtype and bytes of every column before and after)
+    """
+    category_columns = [col for col in (category_columns or []) if col in df.columns]
+    optimized = df.copy(deep=False)
+    rows = []
+    for col in df.columns:
+        column = df[col]
+        converted = None
+        if col in category_columns or ((pd.api.types.is_object_dtype(column) or pd.api.types.is_string_dtype(column))
+                                      and not isinstance(column.dtype, pd.CategoricalDtype)
+                                      and column.nunique() <= max_categories):
+            if not isinstance(column.dtype, pd.CategoricalDtype):
+                converted = column.astype('category')
+        elif pd.api.types.is_integer_dtype(column) and isinstance(column.dtype, np.dtype):
+            converted = pd.to_numeric(column, downcast='integer')
+        elif pd.api.types.is_float_dtype(column) and isinstance(column.dtype, np.dtype):
+            values = column.to_numpy()
+            compact = _float_to_integer(values)
+            if compact is None and column.dtype.itemsize > 4:
+                compact = _float_to_float32(values, float_tolerance)
+            if compact is not None:
+                converted = pd.Series(compact, index=column.index, name=col)
+
+        if converted is not None and converted.dtype != column.dtype:
+            optimized[col] = converted
+        rows.append({
+            'Column': col,
+            'Before': str(column.dtype),
+            'After': str(optimized[col].dtype),
+            'Before (bytes)': column.memory_usage(index=False, deep=True),
+            'After (bytes)': optimized[col].memory_usage(index=False, deep=True),
+        })
+
+    report = pd.DataFrame(rows, columns=['Column', 'Before', 'After', 'Before (bytes)', 'After (bytes)'])
+    if return_report:
+        return optimized, report
+
+    before, after = report['Before (bytes)'].sum(), report['After (bytes)'].sum()
+    saved = (1 - after / before) * 100 if before else 0.0
+    print(f'Memory: {before / 2 ** 20:.2f} MiB -> {after / 2 ** 20:.2f} MiB ({saved:.1f}% saved)')
+    return optimized
+
+def cache_path(path, cache_dir=None, optimize=False, category_columns=None, **read_csv_kwargs) -> str:
+    """Path of the Parquet copy of a CSV file for some read options.
+
+    Args:
+        path (str): Path to the CSV file
+        cache_dir (str, optional): Folder of the Parquet copies. Defaults to CACHE_DIR_NAME next to the CSV file.
+        optimize (bool, optional): The copy holds the data with compact dtypes, see optimize_dtypes. Defaults to False.
+        category_columns (list, optional): Columns converted to category when optimized. Defaults to None.
+        **read_csv_kwargs: Options the file is read with
+
+    Returns:
+        str: Path of the Parquet file
+    """
+    path = os.path.abspath(path)
+    cache_dir = cache_dir if cache_dir is not None else os.path.join(os.path.dirname(path), CACHE_DIR_NAME)
+    key = (path, sorted(read_csv_kwargs.items()))
+    if optimize:
+        # Copies optimized with lossy float32 downcasting used the 'optimize' key, so they are not reused
+        key = (*key, 'optimize-exact', list(category_columns or []))
+    options = hashlib.blake2b(repr(key).encode(), digest_size=8).hexdigest()
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f'{name}-{options}.parquet')
+
+def _read_cached(parquet_path, signature):
+    """Read the Parquet copy if it was written from a source with this signature, else return None."""
+    if not os.path.exists(parquet_path):
+        return None
+    schema = pq.read_schema(parquet_path)
+    metadata = schema.metadata or {}
+    if json.loads(metadata.get(_SOURCE_KEY, b'null')) != signature:
+        return None
+    df = pq.read_table(parquet_path, memory_map=True).to_pandas()
+    # Parquet only reads text dictionaries back as category, numeric category columns are converted again
+    for column in (schema.pandas_metadata or {}).get('columns', []):
+        if column['pandas_type'] == 'categorical' and column['name'] in df.columns and not isinstance(df[column['name']].dtype, pd.CategoricalDtype):
+            df[column['name']] = df[column['name']].astype('category')
+    return df
+
+def _write_cached(df, parquet_path, signature):
+    """Write the Parquet copy atomically, tagged with the source signature."""
+    table = pa.Table.from_pandas(df)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), _SOURCE_KEY: json.dumps(signature).encode()})
+    os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+    temporary_path = f'{parquet_path}.{os.getpid()}.tmp'
+    pq.write_table(table, temporary_path)
+    os.replace(temporary_path, parquet_path)
+
+def clear_data_cache():
+    """Forget the frames loaded by this process. Parquet copies on disk are kept."""
+    _FRAMES.clear()
+
+@instrumented(DATA_PREP)
+def load_data(path, cache_dir=None, validate='mtime', use_cache=True, optimize=False, category_columns=None, **read_csv_kwargs) -> pd.DataFrame:
+    """Load a CSV (or Parquet) file once per process, through a typed Parquet copy on disk.
+
+    The first read of a CSV file writes a Parquet copy tagged with the signature of the CSV
+    (see file_signature). Later calls return the frame kept in memory, or read the Parquet copy
+    in a new process, as long as the signature is the same; a changed file is read again.
+    Every call gets a shallow copy of the same frame, so columns can be added or dropped but
+    values must not be modified in place. With optimize, the data is stored in memory and on
+    disk with the compact dtypes of optimize_dtypes.
+
+    Args:
+        path (str): Path to the CSV or Parquet file
+        cache_dir (str, optional): Folder of the Parquet copies. Defaults to CACHE_DIR_NAME next to the file.
+        validate (str, optional): How a changed file is detected, 'mtime' or 'hash'. Defaults to 'mtime'.
+        use_cache (bool, optional): Use the memory and disk caches. Defaults to True.
+        optimize (bool, optional): Downcast the columns with optimize_dtypes. Defaults to False.
+        category_columns (list, optional): Columns converted to category when optimizing, such as CTG_CATEGORY_COLUMNS. Defaults to None.
+        **read_csv_kwargs: Extra arguments passed to pd.read_csv.
+
+    Returns:
+        pd.DataFrame: Loaded data
+    """
+    signature = file_signature(path, validate)
+    is_parquet = os.path.splitext(path)[1].lower() in ['.parquet', '.pq']
+    if not use_cache:
+        df = pd.read_parquet(path) if is_parquet else pd.read_csv(path, **read_csv_kwargs)
+        return optimize_dtypes(df, category_columns) if optimize else df
+
+    key = (os.path.abspath(path), repr(sorted(read_csv_kwargs.items())), optimize, repr(category_columns) if optimize else None)
+    if key in _FRAMES and _FRAMES[key][0] == signature:
+        return _FRAMES[key][1].copy(deep=False)
+
+    if is_parquet:
+        df = pq.read_table(path, memory_map=True).to_pandas()
+        if optimize:
+            df = optimize_dtypes(df, category_columns)
+    else:
+        parquet_path = cache_path(path, cache_dir, optimize, category_columns, **read_csv_kwargs)
+        df = _read_cached(parquet_path, signature)
+        if df is None:
+            df = pd.read_csv(path, **read_csv_kwargs)
+            if optimize:
+                df = optimize_dtypes(df, category_columns)
+            try:
+                _write_cached(df, parquet_path, signature)
+            except (OSError, pa.ArrowException) as error:
+                print(f'Parquet copy of {path} not written: {error}')
+
+    _FRAMES[key] = (signature, df)
+    return df.copy(deep=False)
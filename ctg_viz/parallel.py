@@ -0,0 +1,130 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Frames with fewer columns are processed in the calling process, where starting workers costs more than it saves
+MIN_PARALLEL_COLUMNS = 64
+# Blocks per worker, so a slow block does not leave the other workers idle
+BLOCKS_PER_WORKER = 4
+
+# Worker pool reused between calls, created on first use
+_POOL = None
+_POOL_WORKERS = None
+
+def resolve_jobs(n_jobs) -> int:
+    """Number of workers for an n_jobs argument, -1 (or None) meaning all cores."""
+    if n_jobs is None or n_jobs == -1:
+        return os.cpu_count() or 1
+    if n_jobs < 1:
+        raise ValueError("Invalid n_jobs. Possible values are -1 or a positive number of workers")
+    return n_jobs
+
+def _get_pool(max_workers) -> ProcessPoolExecutor:
+    global _POOL, _POOL_WORKERS
+    if _POOL is None or _POOL_WORKERS != max_workers:
+        shutdown()
+        _POOL = ProcessPoolExecutor(max_workers=max_workers)
+        _POOL_WORKERS = max_workers
+    return _POOL
+
+def shutdown():
+    """Stop the worker processes. A later call to map_column_blocks starts new ones."""
+    global _POOL, _POOL_WORKERS
+    if _POOL is not None:
+        _POOL.shutdown()
+    _POOL = None
+    _POOL_WORKERS = None
+
+class SharedColumns:
+    """Float64 copy of some columns of a dataframe in shared memory, readable by other processes without pickling it.
+
+    Columns are stored one after the other (column-major), so a block of consecutive columns is a
+    contiguous slice. Use it as a context manager, the memory is released on exit.
+
+    Args:
+        df (pd.DataFrame): Dataframe
+        columns (list): Numeric columns to copy, missing values become NaN
+    """
+    def __init__(self, df, columns):
+        self.shape = (df.shape[0], len(columns))
+        self._memory = shared_memory.SharedMemory(create=True, size=max(1, self.shape[0] * self.shape[1] * 8))
+        self.name = self._memory.name
+        self.values = np.ndarray(self.shape, dtype='float64', buffer=self._memory.buf, order='F')
+        try:
+            # One column at a time, so the frame is never converted as a whole
+            for i, col in enumerate(columns):
+                self.values[:, i] = df[col].to_numpy(dtype='float64', na_value=np.nan)
+        except Exception:
+            # The segment would outlive the process if it was not unlinked here
+            self.close()
+            raise
+
+    def close(self):
+        """Release the shared memory."""
+        self.values = None
+        self._memory.close()
+        self._memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+def _run_block(func, name, shape, start, stop, kwargs):
+    """Apply func to columns start:stop of a SharedColumns, in a worker process."""
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        values = np.ndarray(shape, dtype='float64', buffer=memory.buf, order='F')
+        return func(values[:, start:stop], **kwargs)
+    finally:
+        values = None
+        memory.close()
+
+def column_blocks(n_columns, n_jobs=1, block_columns=None) -> list:
+    """(start, stop) bounds splitting n_columns into blocks, BLOCKS_PER_WORKER per worker unless block_columns is given."""
+    if block_columns is None:
+        block_columns = max(1, math.ceil(n_columns / (resolve_jobs(n_jobs) * BLOCKS_PER_WORKER)))
+    return [(start, min(start + block_columns, n_columns)) for start in range(0, n_columns, block_columns)]
+
+def map_column_blocks(func, df, columns, n_jobs=-1, block_columns=None, min_columns=MIN_PARALLEL_COLUMNS, **kwargs) -> list:
+    """Apply a function to blocks of columns of a dataframe in worker processes.
+
+    The columns are copied once to shared memory as float64 (see SharedColumns) and every worker
+    reads its blocks from there, so only the bounds of each block and the results are pickled.
+    Frames with fewer than min_columns columns, or n_jobs=1, are processed in the calling process
+    with the same blocks.
+
+    Args:
+        func (callable): Module level function taking a 2D float64 array (rows x block columns, NaN for missing values) and **kwargs.
+            It must not modify the array, and must return new arrays rather than views of it.
+        df (pd.DataFrame): Dataframe
+        columns (list): Numeric columns to process
+        n_jobs (int, optional): Worker processes, -1 uses all cores. Defaults to -1.
+        block_columns (int, optional): Columns per block. Defaults to splitting the columns in BLOCKS_PER_WORKER blocks per worker.
+        min_columns (int, optional): Fewer columns are processed without workers. Defaults to MIN_PARALLEL_COLUMNS.
+        **kwargs: Extra arguments passed to func.
+
+    Returns:
+        list: Result of func for each block, in column order
+    """
+    columns = list(columns)
+    n_workers = resolve_jobs(n_jobs)
+    blocks = column_blocks(len(columns), n_workers, block_columns)
+    if n_workers == 1 or len(columns) < min_columns or len(blocks) < 2:
+        return [func(df[columns[start:stop]].to_numpy(dtype='float64', na_value=np.nan), **kwargs) for start, stop in blocks]
+
+    pool = _get_pool(n_workers)
+    with SharedColumns(df, columns) as shared:
+        futures = [pool.submit(_run_block, func, shared.name, shared.shape, start, stop, kwargs) for start, stop in blocks]
+        return [future.result() for future in futures]
+
+def concat_block_results(results) -> dict:
+    """Merge block results that are dicts of per-column arrays into one dict of arrays."""
+    if not results:
+        return {}
+    return {key: np.concatenate([np.atleast_1d(result[key]) for result in results]) for key in results[0]}
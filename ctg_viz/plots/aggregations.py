@@ -0,0 +1,222 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+from ctg_viz.plots.correlation import CorrelationEngine
+from ctg_viz.instrumentation import instrumented, DATA_PREP
+
+# Computed plot data keyed on (function, data fingerprint, parameters), least recently used first
+_CACHE = OrderedDict()
+CACHE_SIZE = 128
+# Charts can be built from several threads (see render.render_charts)
+_CACHE_LOCK = threading.Lock()
+
+def fingerprint(df, columns) -> str:
+    """Fingerprint of the content of some columns of a dataframe.
+
+    Args:
+        df (pandas.DataFrame): Dataframe
+        columns (list): Columns included in the fingerprint
+
+    Returns:
+        str: Hex digest that changes when values, index, dtypes or column names change
+    """
+    subset = df[list(columns)]
+    row_hashes = pd.util.hash_pandas_object(subset, index=True).to_numpy()
+    digest = hashlib.blake2b(row_hashes.tobytes(), digest_size=16)
+    digest.update(repr((tuple(subset.columns), tuple(map(str, subset.dtypes)))).encode())
+    return digest.hexdigest()
+
+def clear_cache():
+    """Remove all cached plot data."""
+    with _CACHE_LOCK:
+        _CACHE.clear()
+
+def _cached(columns_of):
+    """Memoize an aggregation on the fingerprint of the columns it reads and its other arguments.
+
+    Args:
+        columns_of (callable): Receives the call arguments (without df) and returns the columns read from df.
+    """
+    def decorator(func):
+        @instrumented(DATA_PREP)
+        @wraps(func)
+        def wrapper(df, *args, **kwargs):
+            # Lists of columns are turned into tuples so they can be part of the key
+            args = tuple(tuple(arg) if isinstance(arg, list) else arg for arg in args)
+            kwargs = {name: tuple(arg) if isinstance(arg, list) else arg for name, arg in kwargs.items()}
+            columns = [col for col in columns_of(*args, **kwargs) if col is not None]
+            key = (func.__name__, fingerprint(df, columns), args, tuple(sorted(kwargs.items())))
+            with _CACHE_LOCK:
+                if key in _CACHE:
+                    _CACHE.move_to_end(key)
+                    return _CACHE[key]
+
+            result = func(df, *args, **kwargs)
+            with _CACHE_LOCK:
+                _CACHE[key] = result
+                if len(_CACHE) > CACHE_SIZE:
+                    _CACHE.popitem(last=False)
+            return result
+        return wrapper
+    return decorator
+
+# Results are shared between callers, so plotting code must not modify them in place
+
+@_cached(lambda column_values: [column_values])
+def value_counts(df, column_values) -> pd.Series:
+    """Counts of each value of a column sorted in ascending order.
+
+    Args:
+        df (pandas.DataFrame): Dataframe with data to plot
+        column_values (str): Column with values to count
+
+    Returns:
+        pandas.Series: Counts indexed by value
+    """
+    counts = df[column_values].value_counts()
+    if isinstance(df[column_values].dtype, pd.CategoricalDtype):
+        # Categories with no rows are left out, as for the other dtypes
+        counts = counts[counts > 0]
+    return counts.sort_values()
+
+@_cached(lambda column_category, columns: [column_category, *columns])
+def partition_by_category(df, column_category, columns) -> list:
+    """Split some columns of a dataframe by the values of a category column with a single sort.
+
+    Rows are ordered by category code once and every category gets a slice (a view) of that
+    sorted array, instead of scanning the full frame with one mask per category.
+    Categories follow the order of df[column_category].unique(); a missing category gets an empty array.
+
+    Args:
+        df (pandas.DataFrame): Dataframe with data to plot
+        column_category (str): Column with values to group by category
+        columns (tuple): Columns kept for each category
+
+    Returns:
+        list: (category, np.ndarray) pairs, each array with shape (rows in category, len(columns))
+    """
+    codes, categories = pd.factorize(df[column_category])
+    order = np.argsort(codes, kind='stable')
+    values = df[list(columns)].to_numpy()[order]
+    # Codes are sorted with the missing category (-1) first
+    bounds = np.searchsorted(codes[order], np.arange(-1, len(categories) + 1))
+
+    partitions = [(category, values[bounds[code + 1]:bounds[code + 2]]) for code, category in enumerate(categories)]
+    if bounds[0] < bounds[1]:
+        # Keep the position unique() gives to missing values, with no rows as a comparison with NaN never matches
+        first_missing = np.flatnonzero(codes == -1)[0]
+        position = codes[:first_missing].max() + 1 if first_missing else 0
+        partitions.insert(position, (df[column_category].iloc[first_missing], values[:0]))
+    return partitions
+
+@_cached(lambda columns, correlation_method='pearson': list(columns))
+def correlation_matrix(df, columns, correlation_method='pearson') -> pd.DataFrame:
+    """Correlation matrix of some columns.
+
+    Args:
+        df (pandas.DataFrame): Dataframe with data to plot
+        columns (tuple): Columns with values to be used to compute correlation matrix
+        correlation_method (str, optional): Correlation method that will be used. Can be pearson or spearman. Default is pearson.
+
+    Returns:
+        pandas.DataFrame: Correlation matrix
+    """
+    return CorrelationEngine(columns, correlation_method, n_jobs=-1).update(df).corr()
+
+@_cached(lambda column_x, column_y, column_category, bins=200, x_range=None, y_range=None: [column_x, column_y, column_category])
+def binned_counts_2d(df, column_x, column_y, column_category, bins=200, x_range=None, y_range=None) -> tuple:
+    """Count points per category on a common 2D grid, with one bincount for all categories.
+
+    Args:
+        df (pandas.DataFrame): Dataframe with data to plot
+        column_x (str): Column with values for the x axis
+        column_y (str): Column with values for the y axis
+        column_category (str): Column with values to group by category
+        bins (int, optional): Number of bins per axis. Defaults to 200.
+        x_range (tuple, optional): (min, max) of the x axis. Defaults to the range of the data.
+        y_range (tuple, optional): (min, max) of the y axis. Defaults to the range of the data.
+
+    Returns:
+        tuple: (categories, counts with shape (categories, bins x, bins y), x edges, y edges)
+    """
+    codes, categories = pd.factorize(df[column_category])
+    x = df[column_x].to_numpy(dtype='float64', na_value=np.nan)
+    y = df[column_y].to_numpy(dtype='float64', na_value=np.nan)
+
+    valid = (codes >= 0) & ~np.isnan(x) & ~np.isnan(y)
+    # Default ranges span the valid points only, (0, 1) when there are none
+    if x_range is None:
+        x_range = (x[valid].min(), x[valid].max()) if valid.any() else (0.0, 1.0)
+    if y_range is None:
+        y_range = (y[valid].min(), y[valid].max()) if valid.any() else (0.0, 1.0)
+    x_edges = np.linspace(x_range[0], x_range[1] if x_range[1] > x_range[0] else x_range[0] + 1, bins + 1)
+    y_edges = np.linspace(y_range[0], y_range[1] if y_range[1] > y_range[0] else y_range[0] + 1, bins + 1)
+
+    valid &= (x >= x_edges[0]) & (x <= x_edges[-1]) & (y >= y_edges[0]) & (y <= y_edges[-1])
+    ix = np.minimum(((x[valid] - x_edges[0]) / (x_edges[-1] - x_edges[0]) * bins).astype('int64'), bins - 1)
+    iy = np.minimum(((y[valid] - y_edges[0]) / (y_edges[-1] - y_edges[0]) * bins).astype('int64'), bins - 1)
+    flat_index = (codes[valid] * bins + ix) * bins + iy
+    counts = np.bincount(flat_index, minlength=len(categories) * bins * bins).reshape(len(categories), bins, bins)
+
+    return list(categories), counts, x_edges, y_edges
+
+def _batched_histogram(values, codes, n_groups, bins, density) -> tuple:
+    """Histogram of several groups on common bin edges with one bincount.
+
+    Returns:
+        tuple: (heights with shape (n_groups, bins), bin edges)
+    """
+    valid = (codes >= 0) & ~np.isnan(values)
+    edges = np.histogram_bin_edges(values[valid], bins)
+    bin_index = np.clip(np.searchsorted(edges, values[valid], side='right') - 1, 0, bins - 1)
+    counts = np.bincount(codes[valid] * bins + bin_index, minlength=n_groups * bins).reshape(n_groups, bins)
+    if not density:
+        return counts, edges
+    with np.errstate(divide='ignore', invalid='ignore'):
+        heights = counts / (counts.sum(axis=1, keepdims=True) * np.diff(edges))
+    return np.nan_to_num(heights), edges
+
+@_cached(lambda column_values, column_category=None, bins=30, density=False: [column_values, column_category])
+def histogram_by_category(df, column_values, column_category=None, bins=30, density=False) -> tuple:
+    """Bin a column per category on common edges, as np.histogram would for each category.
+
+    Args:
+        df (pandas.DataFrame): Dataframe with data to plot
+        column_values (str): Column with values to bin
+        column_category (str, optional): Column with values to group by category. Defaults to None (single group).
+        bins (int, optional): Number of bins. Defaults to 30.
+        density (bool, optional): Return probability densities instead of counts. Defaults to False.
+
+    Returns:
+        tuple: (categories, heights with shape (categories, bins), bin edges)
+    """
+    values = df[column_values].to_numpy(dtype='float64', na_value=np.nan)
+    if column_category is None:
+        categories = [None]
+        codes = np.zeros(values.shape[0], dtype='int64')
+    else:
+        codes, categories = pd.factorize(df[column_category])
+        categories = list(categories)
+    heights, edges = _batched_histogram(values, codes, len(categories), bins, density)
+    return categories, heights, edges
+
+@_cached(lambda columns, bins=30, density=False: list(columns))
+def histogram_by_column(df, columns, bins=30, density=False) -> tuple:
+    """Bin several columns on common edges with one batched call.
+
+    Args:
+        df (pandas.DataFrame): Dataframe with data to plot
+        columns (tuple): Columns with values to bin
+        bins (int, optional): Number of bins. Defaults to 30.
+        density (bool, optional): Return probability densities instead of counts. Defaults to False.
+
+    Returns:
+        tuple: (heights with shape (columns, bins), bin edges)
+    """
+    values = df[list(columns)].to_numpy(dtype='float64', na_value=np.nan)
+    codes = np.broadcast_to(np.arange(len(columns)), values.shape)
+    return _batched_histogram(values.ravel(), codes.ravel(), len(columns), bins, density)
@@ -1,8 +1,11 @@
 import matplotlib.pyplot as plt
 import seaborn as sns
 import plotly.express as px
+from ctg_viz.plots import aggregations
+from ctg_viz.instrumentation import instrumented, FIGURE_BUILD
 
 # horizontal bar using matplotlib
+@instrumented(FIGURE_BUILD)
 def barh_matplotlib(df, column_values) -> plt.Figure:
     """Plots boxplot using matplotlib library
 
@@ -16,17 +19,18 @@ def barh_matplotlib(df, column_values) -> plt.Figure:
     figsize=(8, 6)
     fig, ax = plt.subplots(figsize=figsize)
 
-    data = df[column_values].value_counts().sort_values()
+    data = aggregations.value_counts(df, column_values)
     
     ax.barh(y=data.index, width=data.values)
     ax.invert_yaxis()
     ax.set_title(f'Horizontal Barplot of {column_values}')
 
     ax.set_xlabel(column_values)
-    plt.tight_layout()
+    fig.tight_layout()
     return fig, ax
 
 # horizontal bar using seaborn
+@instrumented(FIGURE_BUILD)
 def barh_seaborn(df, column_values) -> plt.Figure:
     """Plots boxplot using seaborn library
 
@@ -40,7 +44,7 @@ def barh_seaborn(df, column_values) -> plt.Figure:
     figsize=(8, 6)
     fig, ax = plt.subplots(figsize=figsize)
 
-    data = df[column_values].value_counts().sort_values().reset_index()
+    data = aggregations.value_counts(df, column_values).reset_index()
     data.columns = [column_values, 'counts']
     data[column_values] = data[column_values].astype(str)
     
@@ -49,10 +53,11 @@ def barh_seaborn(df, column_values) -> plt.Figure:
     ax.set_title(f'Horizontal Barplot of {column_values}')
 
     ax.set_xlabel(column_values)
-    plt.tight_layout()
+    fig.tight_layout()
     return fig, ax
 
 # horizontal bar using plotly
+@instrumented(FIGURE_BUILD)
 def barh_plotly(df, column_values) -> plt.Figure:
     """Plots boxplot using plotly library
 
@@ -64,7 +69,7 @@ def barh_plotly(df, column_values) -> plt.Figure:
         plt.Figure: Returns a matplotlib Figure object
     """
 
-    data = df[column_values].value_counts().sort_values().reset_index()
+    data = aggregations.value_counts(df, column_values).reset_index()
     data.columns = [column_values, 'counts']
     data[column_values] = data[column_values].astype(str)
 
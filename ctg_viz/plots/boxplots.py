@@ -1,8 +1,12 @@
 import matplotlib.pyplot as plt
+import numpy as np
 import seaborn as sns
 import plotly.express as px
+from ctg_viz.plots import aggregations
+from ctg_viz.instrumentation import instrumented, FIGURE_BUILD
 
 # boxplot using matplotlib
+@instrumented(FIGURE_BUILD)
 def boxplot_matplotlib(df, column_values, column_cathegory=None) -> plt.Figure:
     """Plots boxplot using matplotlib library
 
@@ -17,18 +21,20 @@ def boxplot_matplotlib(df, column_values, column_cathegory=None) -> plt.Figure:
     figsize=(8, 6)
     fig, ax = plt.subplots(figsize=figsize)
     if column_cathegory:
-        data_to_plot = [df[df[column_cathegory] == cat][column_values].dropna() for cat in df[column_cathegory].unique()]
-        ax.boxplot(data_to_plot, labels=df[column_cathegory].unique(), patch_artist=True)
+        groups = aggregations.partition_by_category(df, column_cathegory, [column_values])
+        data_to_plot = [values[~np.isnan(values[:, 0]), 0] for _, values in groups]
+        ax.boxplot(data_to_plot, labels=[cat for cat, _ in groups], patch_artist=True)
         ax.set_title(f'Boxplot of {column_values} by {column_cathegory}')
     else:
         ax.boxplot(df[column_values].dropna(), patch_artist=True)
         ax.set_title(f'Boxplot of {column_values}')
 
     ax.set_ylabel(column_values)
-    plt.tight_layout()
+    fig.tight_layout()
     return fig, ax
 
 # boxplot using seaborn
+@instrumented(FIGURE_BUILD)
 def boxplot_seaborn(df, column_values, column_cathegory=None) -> plt.Figure:
     """Plots boxplot using seaborn library
 
@@ -50,10 +56,11 @@ def boxplot_seaborn(df, column_values, column_cathegory=None) -> plt.Figure:
         ax.set_title(f'Boxplot of {column_values}')
 
     ax.set_ylabel(column_values)
-    plt.tight_layout()
+    fig.tight_layout()
     return fig, ax
 
 # boxplot using plotly
+@instrumented(FIGURE_BUILD)
 def boxplot_plotly(df, column_values, column_cathegory=None) -> plt.Figure:
     """Plots boxplot using seaborn library
 
@@ -0,0 +1,119 @@
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from ctg_viz.instrumentation import instrumented, STATISTICS
+from ctg_viz.parallel import resolve_jobs
+
+def _blocked_product(a, b, block_size=64, n_jobs=1) -> np.ndarray:
+    """Compute a.T @ b by blocks of columns of a, spread over a thread pool (NumPy releases the GIL)."""
+    max_workers = resolve_jobs(n_jobs)
+    if max_workers == 1 or a.shape[1] <= block_size:
+        return a.T @ b
+    starts = range(0, a.shape[1], block_size)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        blocks = list(executor.map(lambda start: a[:, start:start + block_size].T @ b, starts))
+    return np.vstack(blocks)
+
+class CorrelationEngine:
+    """Correlation matrix of a fixed set of columns that can be updated with appended rows.
+
+    Pearson correlations are kept as sufficient statistics (pairwise counts, sums, sums of squares
+    and cross-products over the rows where both columns are present), so appending rows only costs
+    a pass over the new rows and corr() costs O(columns^2). Spearman keeps the values and caches the
+    per-column ranks until new rows arrive. Missing values are handled pairwise, as pandas.DataFrame.corr.
+
+    Args:
+        columns (list): Columns of the correlation matrix
+        correlation_method (str, optional): Correlation method that will be used. Can be pearson or spearman. Default is pearson.
+        n_jobs (int, optional): Threads used for the cross-products, -1 uses all cores. Defaults to 1.
+        block_size (int, optional): Columns per block of the cross-products. Defaults to 64.
+    """
+    def __init__(self, columns, correlation_method='pearson', n_jobs=1, block_size=64):
+        if correlation_method not in ['pearson', 'spearman']:
+            raise ValueError("correlation_method must be 'pearson' or 'spearman'")
+        self.columns = list(columns)
+        self.correlation_method = correlation_method
+        resolve_jobs(n_jobs)
+        self.n_jobs = n_jobs
+        self.block_size = block_size
+        self.n_rows = 0
+
+        k = len(self.columns)
+        self._shift = None
+        self._count = np.zeros((k, k))
+        self._sum = np.zeros((k, k))
+        self._sum_squares = np.zeros((k, k))
+        self._cross = np.zeros((k, k))
+        self._chunks = []
+        self._ranks = None
+
+    @instrumented(STATISTICS)
+    def update(self, df) -> 'CorrelationEngine':
+        """Append the rows of df.
+
+        Args:
+            df (pandas.DataFrame): New rows with (at least) the engine columns
+
+        Returns:
+            CorrelationEngine: The updated engine
+        """
+        values = df[self.columns].to_numpy(dtype='float64', na_value=np.nan)
+        self.n_rows += values.shape[0]
+        if self.correlation_method == 'spearman':
+            self._chunks.append(values)
+            self._ranks = None
+        else:
+            self._accumulate(values)
+        return self
+
+    def _accumulate(self, values):
+        if self._shift is None:
+            # Shifting by the first means keeps the raw sums small; correlations do not change
+            # nanmean warns about all-missing columns through the warnings module, not errstate
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                self._shift = np.nan_to_num(np.nanmean(values, axis=0)) if values.shape[0] else np.zeros(values.shape[1])
+        centered = values - self._shift
+        present = ~np.isnan(centered)
+        filled = np.where(present, centered, 0.0)
+        present = present.astype('float64')
+
+        self._count += _blocked_product(present, present, self.block_size, self.n_jobs)
+        self._sum += _blocked_product(filled, present, self.block_size, self.n_jobs)
+        self._sum_squares += _blocked_product(filled ** 2, present, self.block_size, self.n_jobs)
+        self._cross += _blocked_product(filled, filled, self.block_size, self.n_jobs)
+
+    def _pearson(self) -> np.ndarray:
+        n = self._count
+        numerator = n * self._cross - self._sum * self._sum.T
+        variance = n * self._sum_squares - self._sum ** 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = numerator / np.sqrt(variance * variance.T)
+        corr = np.where(np.isfinite(corr), np.clip(corr, -1.0, 1.0), np.nan)
+        diagonal = np.diag(variance) > 0
+        corr[np.diag_indices_from(corr)] = np.where(diagonal, 1.0, np.nan)
+        return corr
+
+    def _spearman(self) -> np.ndarray:
+        values = np.vstack(self._chunks) if self._chunks else np.empty((0, len(self.columns)))
+        self._chunks = [values]
+        if np.isnan(values).any():
+            # Ranks depend on the pairwise complete rows, so per-column ranks cannot be reused
+            return pd.DataFrame(values, columns=self.columns).corr(method='spearman').to_numpy()
+        if self._ranks is None:
+            self._ranks = pd.DataFrame(values).rank().to_numpy()
+        ranks = CorrelationEngine(range(len(self.columns)), 'pearson', self.n_jobs, self.block_size)
+        ranks._accumulate(self._ranks)
+        return ranks._pearson()
+
+    @instrumented(STATISTICS)
+    def corr(self) -> pd.DataFrame:
+        """Current correlation matrix.
+
+        Returns:
+            pandas.DataFrame: Correlation matrix indexed by the engine columns
+        """
+        matrix = self._spearman() if self.correlation_method == 'spearman' else self._pearson()
+        return pd.DataFrame(matrix, index=self.columns, columns=self.columns)
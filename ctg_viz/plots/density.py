@@ -1,15 +1,38 @@
 import matplotlib.pyplot as plt
+import numpy as np
 import seaborn as sns
-import plotly.figure_factory as ff
+import plotly.express as px
+import plotly.graph_objects as go
+from ctg_viz.plots import aggregations
+from ctg_viz.plots import kde as kde_engine
+from ctg_viz.instrumentation import instrumented, FIGURE_BUILD
+
+def _category_samples(df, column_values, column_category) -> tuple:
+    """Non-null values of each category with at least two distinct values.
+
+    Returns:
+        tuple: (list of categories, list of np.ndarray samples)
+    """
+    categories = []
+    samples = []
+    for category, values in aggregations.partition_by_category(df, column_category, [column_values]):
+        sample = values[~np.isnan(values[:, 0]), 0]
+        if np.unique(sample).shape[0] < 2:
+            continue
+        categories.append(category)
+        samples.append(sample)
+    return categories, samples
 
 # density (kde) chart using matplotlib
-def density_matplotlib(df, column_values, column_category) -> plt.Figure:
+@instrumented(FIGURE_BUILD)
+def density_matplotlib(df, column_values, column_category, bw_method='scott') -> plt.Figure:
     """Plots a density chart using matplotlib library
 
     Args:
         df (pandas.DataFrame): Dataframe with data to plot
         column_values (str): Column with values to be used for densities
         column_category (str): Column with values to group by category
+        bw_method (str or float, optional): KDE bandwidth rule, 'scott', 'silverman' or a scalar factor. Defaults to 'scott'.
 
     Returns:
         plt.Figure: Returns a matplotlib Figure object
@@ -17,28 +40,29 @@ def density_matplotlib(df, column_values, column_category) -> plt.Figure:
     figsize=(8, 6)
     fig, ax = plt.subplots(figsize=figsize)
     
-    categories = df[column_category].unique()
-    for category in categories:
-        subset = df[df[column_category] == category]
-        if subset[column_values].unique().shape[0] < 2:
-            continue
-        subset[column_values].plot(kind='kde', ax=ax, label=category)
+    # All categories share one binned KDE pass; curves span half the range beyond the data, as pandas kde plots
+    categories, samples = _category_samples(df, column_values, column_category)
+    for category, (x, density) in zip(categories, kde_engine.kde_curves(samples, 1000, bw_method, cut=0.5)):
+        ax.plot(x, density, label=category)
     
     ax.set_xlabel(column_values)
+    ax.set_ylabel('Density')
     ax.set_title(f'Density Plot of {column_values} by {column_category}')
     ax.legend()
     
-    plt.tight_layout()
+    fig.tight_layout()
     return fig, ax
 
 # density (kde) chart using seaborn
-def density_seaborn(df, column_values, column_category) -> plt.Figure:
+@instrumented(FIGURE_BUILD)
+def density_seaborn(df, column_values, column_category, bw_method='scott') -> plt.Figure:
     """Plots a density chart using seaborn library
 
     Args:
         df (pandas.DataFrame): Dataframe with data to plot
         column_values (str): Column with values to be used for densities
         column_category (str): Column with values to group by category
+        bw_method (str or float, optional): KDE bandwidth rule, 'scott', 'silverman' or a scalar factor. Defaults to 'scott'.
 
     Returns:
         plt.Figure: Returns a matplotlib Figure object
@@ -46,42 +70,38 @@ def density_seaborn(df, column_values, column_category) -> plt.Figure:
     figsize=(8, 6)
     fig, ax = plt.subplots(figsize=figsize)
     
-    for category in df[column_category].unique():
-        subset = df[df[column_category] == category]
-        if subset[column_values].unique().shape[0] < 2:
-            continue
-        sns.kdeplot(data=subset, x=column_values, hue=column_category, ax=ax, label=category)
+    categories, samples = _category_samples(df, column_values, column_category)
+    for category, (x, density) in zip(categories, kde_engine.kde_curves(samples, 200, bw_method, cut=0.5)):
+        sns.lineplot(x=x, y=density, ax=ax, label=category)
     
     ax.set_xlabel(column_values)
+    ax.set_ylabel('Density')
     ax.set_title(f'Density Plot of {column_values} by {column_category}')
     ax.legend()
     
     return fig, ax
 
 # density (kde) chart using plotly
-def density_plotly(df, column_values, column_category) -> plt.Figure:
+@instrumented(FIGURE_BUILD)
+def density_plotly(df, column_values, column_category, bw_method='scott') -> plt.Figure:
     """Plots a density chart using plotly library
 
     Args:
         df (pandas.DataFrame): Dataframe with data to plot
         column_values (str): Column with values to be used for densities
         column_category (str): Column with values to group by category
+        bw_method (str or float, optional): KDE bandwidth rule, 'scott', 'silverman' or a scalar factor. Defaults to 'scott'.
 
     Returns:
         plt.Figure: Returns a matplotlib Figure object
     """
-    # Group by category and create the necessary lists
-    hist_data = []
-    group_labels = []
+    categories, samples = _category_samples(df, column_values, column_category)
+    colors = px.colors.qualitative.Plotly
 
-    for category in df['DP'].unique():
-        subset = df[df['DP'] == category]['b'].dropna()
-        if subset.nunique() < 2:
-            continue
-        hist_data.append(subset)
-        group_labels.append(category)
+    # One KDE line per category over its own range, as the distplot curves it replaces
+    fig = go.Figure()
+    for i, (category, (x, density)) in enumerate(zip(categories, kde_engine.kde_curves(samples, 500, bw_method))):
+        fig.add_trace(go.Scatter(x=x, y=density, mode='lines', name=str(category), line=dict(color=colors[i % len(colors)])))
 
-    # Create distplot with curve_type set to 'normal'
-    fig = ff.create_distplot(hist_data, group_labels, show_hist=False,  show_rug=False)
-    fig
+    fig.update_layout(xaxis_title=column_values, yaxis_title='Density', legend_title=column_category)
     return fig
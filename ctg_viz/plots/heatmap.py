@@ -1,16 +1,91 @@
 import matplotlib.pyplot as plt
 import numpy as np
+import pandas as pd
 import seaborn as sns
-import plotly.figure_factory as ff
+import plotly.graph_objects as go
+from scipy.cluster.hierarchy import leaves_list, linkage
+from scipy.spatial.distance import squareform
+from ctg_viz.plots import aggregations
+from ctg_viz.instrumentation import instrumented, FIGURE_BUILD
+
+# Matrices with more columns than this are not annotated when annotate='auto'
+ANNOTATE_MAX_COLUMNS = 30
+# Most tick labels drawn per axis, larger matrices label every k-th column
+MAX_TICK_LABELS = 50
+
+def _cluster_order(values) -> np.ndarray:
+    """Order of the columns given by average-linkage hierarchical clustering on 1 - |correlation|."""
+    if values.shape[0] < 3:
+        return np.arange(values.shape[0])
+    distance = 1 - np.abs(np.nan_to_num(values, nan=0.0))
+    distance = np.clip((distance + distance.T) / 2, 0.0, 1.0)
+    np.fill_diagonal(distance, 0.0)
+    return leaves_list(linkage(squareform(distance, checks=False), method='average'))
+
+def _block_mean(corr_matrix, max_size) -> pd.DataFrame:
+    """Average a correlation matrix over square blocks of consecutive columns so it has at most max_size rows."""
+    n = corr_matrix.shape[0]
+    block = int(np.ceil(n / max_size))
+    if block <= 1:
+        return corr_matrix
+    n_blocks = int(np.ceil(n / block))
+    padded = np.full((n_blocks * block, n_blocks * block), np.nan)
+    padded[:n, :n] = corr_matrix.to_numpy()
+    blocks = padded.reshape(n_blocks, block, n_blocks, block)
+    present = ~np.isnan(blocks)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = np.where(present, blocks, 0.0).sum(axis=(1, 3)) / present.sum(axis=(1, 3))
+    names = list(corr_matrix.columns)
+    labels = [f'{names[start]} .. {names[min(start + block, n) - 1]}' if min(start + block, n) - start > 1 else str(names[start])
+              for start in range(0, n, block)]
+    return pd.DataFrame(values, index=labels, columns=labels)
+
+def _heatmap_matrix(df, columns, correlation_method, engine, cluster, max_size) -> tuple:
+    """Correlation matrix to draw, optionally reordered by clustering and averaged over blocks.
+
+    Returns:
+        tuple: (correlation matrix, correlation method)
+    """
+    # Compute correlation matrix (shared with the other backends through the aggregation cache)
+    if engine is not None:
+        correlation_method = engine.correlation_method
+        corr_matrix = engine.corr().loc[columns, columns]
+    else:
+        corr_matrix = aggregations.correlation_matrix(df, columns, correlation_method)
+
+    if cluster:
+        order = _cluster_order(corr_matrix.to_numpy())
+        corr_matrix = corr_matrix.iloc[order, order]
+    if max_size is not None:
+        corr_matrix = _block_mean(corr_matrix, max_size)
+    return corr_matrix, correlation_method
+
+def _annotation_mask(values, annotate='auto', annot_threshold=0.0) -> np.ndarray:
+    """Cells that get a text annotation: none above ANNOTATE_MAX_COLUMNS columns in 'auto' mode, else those with |value| >= annot_threshold."""
+    if annotate == 'auto':
+        annotate = values.shape[1] <= ANNOTATE_MAX_COLUMNS
+    if not annotate:
+        return np.zeros(values.shape, dtype=bool)
+    with np.errstate(invalid='ignore'):
+        return np.abs(values) >= annot_threshold
 
 # heatmap chart using matplotlib only
-def corr_heatmap_matplotlib(df, columns, correlation_method='pearson') -> plt.Figure:
+@instrumented(FIGURE_BUILD)
+def corr_heatmap_matplotlib(df, columns, correlation_method='pearson', engine=None, cluster=False, annotate='auto', annot_threshold=0.0, max_size=None) -> plt.Figure:
     """Plots a heatmap chart using matplotlib library
 
+    The matrix is drawn as a single image, so only the annotations and tick labels grow with the
+    number of columns; both are limited for large matrices.
+
     Args:
         df (pandas.DataFrame): Dataframe with data to plot
         columns (list): Columns with values to be used to compute correlation matrix
         correlation_method (str, optional): Correlation method that will be used. Can be pearson or spearman. Default is pearson.
+        engine (CorrelationEngine, optional): Incrementally updated engine to read the matrix from instead of computing it from df. Defaults to None.
+        cluster (bool, optional): Reorder the columns by hierarchical clustering so correlated columns are adjacent. Defaults to False.
+        annotate (bool or str, optional): Write the values in the cells. 'auto' only does it up to ANNOTATE_MAX_COLUMNS columns. Defaults to 'auto'.
+        annot_threshold (float, optional): Only annotate cells whose absolute value is at least this. Defaults to 0.
+        max_size (int, optional): Average the matrix over blocks of columns so at most max_size rows are drawn. Defaults to None (no downsampling).
 
     Returns:
         plt.Figure: Returns a matplotlib Figure object
@@ -19,64 +94,69 @@ def corr_heatmap_matplotlib(df, columns, correlation_method='pearson') -> plt.Fi
     if correlation_method not in ['pearson', 'spearman']:
         raise ValueError("correlation_method must be 'pearson' or 'spearman'")
     
-    # Filter dataframe to only include specified columns
-    df_subset = df[columns].copy()
-    
-    # Compute correlation matrix
-    corr_matrix = df_subset.corr(method=correlation_method)
+    corr_matrix, correlation_method = _heatmap_matrix(df, columns, correlation_method, engine, cluster, max_size)
+    values = corr_matrix.to_numpy()
+    labels = list(corr_matrix.columns)
     
     # Create figure and axis
     fig, ax = plt.subplots(figsize=(10, 8))
     
     # Create heatmap using imshow
-    im = ax.imshow(corr_matrix, cmap='coolwarm', aspect='auto', 
+    im = ax.imshow(values, cmap='coolwarm', aspect='auto', 
                    vmin=-1, vmax=1, interpolation='nearest')
     
     # Add colorbar
-    cbar = plt.colorbar(im, ax=ax)
+    cbar = fig.colorbar(im, ax=ax)
     cbar.set_label('Correlation Coefficient', rotation=270, labelpad=20, fontsize=11)
     
-    # Set ticks and labels
-    n_cols = len(columns)
-    ax.set_xticks(np.arange(n_cols))
-    ax.set_yticks(np.arange(n_cols))
-    ax.set_xticklabels(columns, rotation=45, ha='right', fontsize=10)
-    ax.set_yticklabels(columns, fontsize=10)
+    # Set ticks and labels, every k-th column for large matrices
+    n_cols = len(labels)
+    ticks = np.arange(0, n_cols, int(np.ceil(n_cols / MAX_TICK_LABELS)) if n_cols else 1)
+    ax.set_xticks(ticks)
+    ax.set_yticks(ticks)
+    ax.set_xticklabels([labels[i] for i in ticks], rotation=45, ha='right', fontsize=10)
+    ax.set_yticklabels([labels[i] for i in ticks], fontsize=10)
     
     # Add correlation values as text annotations
-    for i in range(n_cols):
-        for j in range(n_cols):
-            value = corr_matrix.iloc[i, j]
-            # Use white text for dark backgrounds, black for light
-            text_color = 'white' if abs(value) > 0.5 else 'black'
-            ax.text(j, i, f'{value:.2f}', 
-                   ha='center', va='center', 
-                   color=text_color, fontsize=9)
+    for i, j in zip(*np.nonzero(_annotation_mask(values, annotate, annot_threshold))):
+        value = values[i, j]
+        # Use white text for dark backgrounds, black for light
+        text_color = 'white' if abs(value) > 0.5 else 'black'
+        ax.text(j, i, f'{value:.2f}', 
+               ha='center', va='center', 
+               color=text_color, fontsize=9)
     
     # Add title
     method_title = correlation_method.capitalize()
     ax.set_title(f'{method_title} Correlation Heatmap', 
                 fontsize=14, fontweight='bold', pad=20)
     
-    # Add grid
-    ax.set_xticks(np.arange(n_cols + 1) - 0.5, minor=True)
-    ax.set_yticks(np.arange(n_cols + 1) - 0.5, minor=True)
-    ax.grid(which='minor', color='gray', linestyle='-', linewidth=0.5)
-    ax.tick_params(which='minor', size=0)
+    # Add grid, only while the cells are large enough to see it
+    if n_cols <= ANNOTATE_MAX_COLUMNS:
+        ax.set_xticks(np.arange(n_cols + 1) - 0.5, minor=True)
+        ax.set_yticks(np.arange(n_cols + 1) - 0.5, minor=True)
+        ax.grid(which='minor', color='gray', linestyle='-', linewidth=0.5)
+        ax.tick_params(which='minor', size=0)
     
     # Adjust layout
-    plt.tight_layout()
+    fig.tight_layout()
     
     return fig
 
 # heatmap chart using seaborn
-def corr_heatmap_seaborn(df, columns, correlation_method='pearson') -> plt.Figure:
+@instrumented(FIGURE_BUILD)
+def corr_heatmap_seaborn(df, columns, correlation_method='pearson', engine=None, cluster=False, annotate='auto', annot_threshold=0.0, max_size=None) -> plt.Figure:
     """Plots a heatmap chart using seaborn library
 
     Args:
         df (pandas.DataFrame): Dataframe with data to plot
         columns (list): Columns with values to be used to compute correlation matrix
         correlation_method (str, optional): Correlation method that will be used. Can be pearson or spearman. Default is pearson.
+        engine (CorrelationEngine, optional): Incrementally updated engine to read the matrix from instead of computing it from df. Defaults to None.
+        cluster (bool, optional): Reorder the columns by hierarchical clustering so correlated columns are adjacent. Defaults to False.
+        annotate (bool or str, optional): Write the values in the cells. 'auto' only does it up to ANNOTATE_MAX_COLUMNS columns. Defaults to 'auto'.
+        annot_threshold (float, optional): Only annotate cells whose absolute value is at least this. Defaults to 0.
+        max_size (int, optional): Average the matrix over blocks of columns so at most max_size rows are drawn. Defaults to None (no downsampling).
 
     Returns:
         plt.Figure: Returns a matplotlib Figure object
@@ -85,17 +165,15 @@ def corr_heatmap_seaborn(df, columns, correlation_method='pearson') -> plt.Figur
     if correlation_method not in ['pearson', 'spearman']:
         raise ValueError("correlation_method must be 'pearson' or 'spearman'")
     
-    # Filter dataframe to only include specified columns
-    df_subset = df[columns].copy()
-    
-    # Compute correlation matrix
-    corr_matrix = df_subset.corr(method=correlation_method)
+    corr_matrix, correlation_method = _heatmap_matrix(df, columns, correlation_method, engine, cluster, max_size)
+    mask = _annotation_mask(corr_matrix.to_numpy(), annotate, annot_threshold)
+    annot = np.where(mask, corr_matrix.map('{:.2f}'.format).to_numpy(), '') if mask.any() else False
     
     # Create figure and axis
     fig, ax = plt.subplots(figsize=(10, 8))
     
     # Create heatmap using seaborn
-    sns.heatmap(corr_matrix, annot=True, fmt=".2f", cmap='coolwarm', 
+    sns.heatmap(corr_matrix, annot=annot, fmt='', cmap='coolwarm', 
                 vmin=-1, vmax=1, square=True, cbar_kws={"label": "Correlation Coefficient"}, ax=ax)
     
     # Add title
@@ -104,18 +182,27 @@ def corr_heatmap_seaborn(df, columns, correlation_method='pearson') -> plt.Figur
                  fontsize=14, fontweight='bold', pad=20)
     
     # Adjust layout
-    plt.tight_layout()
+    fig.tight_layout()
     
     return fig
 
 # heatmap chart using plotly
-def corr_heatmap_plotly(df, columns, correlation_method='pearson') -> plt.Figure:
+@instrumented(FIGURE_BUILD)
+def corr_heatmap_plotly(df, columns, correlation_method='pearson', engine=None, cluster=False, annotate='auto', annot_threshold=0.0, max_size=None) -> plt.Figure:
     """Plots a heatmap chart using plotly library
 
+    The annotations are drawn by the heatmap trace itself (texttemplate) instead of one layout
+    annotation per cell.
+
     Args:
         df (pandas.DataFrame): Dataframe with data to plot
         columns (list): Columns with values to be used to compute correlation matrix
         correlation_method (str, optional): Correlation method that will be used. Can be pearson or spearman. Default is pearson.
+        engine (CorrelationEngine, optional): Incrementally updated engine to read the matrix from instead of computing it from df. Defaults to None.
+        cluster (bool, optional): Reorder the columns by hierarchical clustering so correlated columns are adjacent. Defaults to False.
+        annotate (bool or str, optional): Write the values in the cells. 'auto' only does it up to ANNOTATE_MAX_COLUMNS columns. Defaults to 'auto'.
+        annot_threshold (float, optional): Only annotate cells whose absolute value is at least this. Defaults to 0.
+        max_size (int, optional): Average the matrix over blocks of columns so at most max_size rows are drawn. Defaults to None (no downsampling).
 
     Returns:
         plt.Figure: Returns a matplotlib Figure object
@@ -124,24 +211,24 @@ def corr_heatmap_plotly(df, columns, correlation_method='pearson') -> plt.Figure
     if correlation_method not in ['pearson', 'spearman']:
         raise ValueError("correlation_method must be 'pearson' or 'spearman'")
     
-    # Filter dataframe to only include specified columns
-    df_subset = df[columns].copy()
-    
-    # Compute correlation matrix
-    corr_matrix = df_subset.corr(method=correlation_method)
+    corr_matrix, correlation_method = _heatmap_matrix(df, columns, correlation_method, engine, cluster, max_size)
+    values = corr_matrix.to_numpy()
+    mask = _annotation_mask(values, annotate, annot_threshold)
     
     # Create heatmap using plotly
-    fig = ff.create_annotated_heatmap(
-        z=corr_matrix.values,
-        x=list(corr_matrix.columns),
-        y=list(corr_matrix.index),
+    heatmap = dict(
+        z=values,
+        x=list(map(str, corr_matrix.columns)),
+        y=list(map(str, corr_matrix.index)),
         colorscale='RdBu',
         zmin=-1,
         zmax=1,
-        annotation_text=np.round(corr_matrix.values, 2).astype(str).tolist(),
         showscale=True,
         colorbar=dict(title='Correlation Coefficient')
     )
+    if mask.any():
+        heatmap.update(text=np.where(mask, np.round(values, 2).astype(str), ''), texttemplate='%{text}')
+    fig = go.Figure(go.Heatmap(**heatmap))
     
     # Add title
     method_title = correlation_method.capitalize()
@@ -149,7 +236,9 @@ def corr_heatmap_plotly(df, columns, correlation_method='pearson') -> plt.Figure
         title=f'{method_title} Correlation Heatmap',
         title_x=0.5,
         width=800,
-        height=600
+        height=600,
+        xaxis=dict(side='top', ticks=''),
+        yaxis=dict(ticks='')
     )
     
-    return fig
\ No newline at end of file
+    return fig
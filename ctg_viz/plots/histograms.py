@@ -6,12 +6,19 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 from scipy import stats
+from ctg_viz.plots import kde as kde_engine
+from ctg_viz.plots import aggregations
+from ctg_viz.instrumentation import instrumented, FIGURE_BUILD
 
 # Default color palettes
 MATPLOTLIB_COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', 
                      '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
 
-def histogram_matplotlib(df, columns, show_density=False, show_kde=False) -> plt.Figure:
+# Above this number of rows plotly histograms are binned in Python and sent as bar traces
+PREBIN_ROWS = 50_000
+
+@instrumented(FIGURE_BUILD)
+def histogram_matplotlib(df, columns, show_density=False, show_kde=False, bw_method='scott') -> plt.Figure:
     """Function to plot multiple columns in a single chart with matplotlib library
 
     Args:
@@ -20,6 +27,7 @@ def histogram_matplotlib(df, columns, show_density=False, show_kde=False) -> plt
         show_density (bool, optional): Flag to show density. Defaults to False.
         show_kde (bool, optional): Flag to show kde. Defaults to False.
         bins (int, optional): Number of bins for the charts. Defaults to 30.
+        bw_method (str or float, optional): KDE bandwidth rule, 'scott', 'silverman' or a scalar factor. Defaults to 'scott'.
 
     Returns:
         plt.figure, plt.ax: matplotlib figure and axes objects
@@ -36,8 +44,8 @@ def histogram_matplotlib(df, columns, show_density=False, show_kde=False) -> plt
 
         if show_kde:
             x_range = np.linspace(min(values), max(values), 20)
-            kde = stats.gaussian_kde(values)
-            ax.plot(x_range, kde(x_range), '-', linewidth=2, label=f'{column} KDE', color=color, alpha=0.7)
+            kde = kde_engine.binned_kde([values], x_range, bw_method)[0]
+            ax.plot(x_range, kde, '-', linewidth=2, label=f'{column} KDE', color=color, alpha=0.7)
 
         if show_density:
             x_range = np.linspace(min(values), max(values), 20)
@@ -55,6 +63,7 @@ def histogram_matplotlib(df, columns, show_density=False, show_kde=False) -> plt
 
     return fig, ax
 
+@instrumented(FIGURE_BUILD)
 def histogram_seaborn(df, columns, show_kde=False, show_density=False) -> plt.Figure:
     """Function to plot multiple columns in a single chart with seaborn library
 
@@ -78,7 +87,8 @@ def histogram_seaborn(df, columns, show_kde=False, show_density=False) -> plt.Fi
     return fig, ax
 
 
-def histogram_plotly(df, columns, bins=30, show_kde=False, show_density=False, chart_title='Histogram') -> plt.Figure:
+@instrumented(FIGURE_BUILD)
+def histogram_plotly(df, columns, bins=30, show_kde=False, show_density=False, chart_title='Histogram', bw_method='scott', prebinned=None) -> plt.Figure:
     """Function to plot multiple columns in a single chart with seaborn library
 
     Args:
@@ -86,28 +96,48 @@ def histogram_plotly(df, columns, bins=30, show_kde=False, show_density=False, c
         columns (list): list with the name of columns to be plotted
         show_density (bool, optional): Flag to show density. Defaults to False.
         show_kde (bool, optional): Flag to show kde. Defaults to False.
+        bw_method (str or float, optional): KDE bandwidth rule, 'scott', 'silverman' or a scalar factor. Defaults to 'scott'.
+        prebinned (bool, optional): Compute `bins` bins with NumPy and send only bar heights instead of raw rows.
+            Defaults to None, which prebins when the dataframe has more than PREBIN_ROWS rows.
 
     Returns:
         fig: plotly figure object
     """
     histnorm = 'probability density' if (show_density or show_kde) else None
+    if prebinned is None:
+        prebinned = df.shape[0] > PREBIN_ROWS
     
-    fig = px.histogram(
-        df,
-        x=columns,
-        barmode='overlay',
-        histnorm=histnorm,
-        title=chart_title,
-        opacity=0.7
-    )
+    if prebinned:
+        # Figure size depends on the number of bins, not on the number of rows
+        heights, edges = aggregations.histogram_by_column(df, columns, bins, histnorm is not None)
+        colors = px.colors.qualitative.Plotly
+        fig = go.Figure()
+        for i, col in enumerate(columns):
+            fig.add_trace(go.Bar(
+                x=(edges[:-1] + edges[1:]) / 2,
+                y=heights[i],
+                width=np.diff(edges),
+                name=col,
+                opacity=0.7,
+                marker=dict(color=colors[i % len(colors)])
+            ))
+        fig.update_layout(barmode='overlay', title=chart_title)
+    else:
+        fig = px.histogram(
+            df,
+            x=columns,
+            barmode='overlay',
+            histnorm=histnorm,
+            title=chart_title,
+            opacity=0.7
+        )
     
     if show_kde:
         colors = px.colors.qualitative.Plotly
         for i, col in enumerate(columns):
             data = df[col].dropna()
             x_range = np.linspace(data.min(), data.max(), 200)
-            kde = stats.gaussian_kde(data)
-            y_kde = kde(x_range)
+            y_kde = kde_engine.binned_kde([data.to_numpy()], x_range, bw_method)[0]
             
             fig.add_trace(go.Scatter(
                 x=x_range,
@@ -3,10 +3,17 @@ import plotly.express as px
 import plotly.graph_objects as go
 import matplotlib.pyplot as plt
 import numpy as np
-from scipy import stats
+from ctg_viz.plots import kde as kde_engine
 import seaborn as sns
+import pandas as pd
+from ctg_viz.plots import aggregations
+from ctg_viz.instrumentation import instrumented, FIGURE_BUILD
 
-def histogram_matplotlib(df, column_values, column_category=None, show_kde=False, show_density=False) -> plt.Figure:
+# Above this number of rows plotly histograms are binned in Python and sent as bar traces
+PREBIN_ROWS = 50_000
+
+@instrumented(FIGURE_BUILD)
+def histogram_matplotlib(df, column_values, column_category=None, show_kde=False, show_density=False, bw_method='scott') -> plt.Figure:
     """Plot histograms with optional category splitting and KDE overlay.
 
     Args:
@@ -14,6 +21,7 @@ def histogram_matplotlib(df, column_values, column_category=None, show_kde=False
         column_values (str): Name of the column containing numeric values to plot.
         column_category (str, optional): Name of the column to split data by categories. If None, plots single histogram.. Defaults to None.
         show_kde (bool, optional): Whether to overlay a Kernel Density Estimate curve.. Defaults to False.
+        bw_method (str or float, optional): KDE bandwidth rule, 'scott', 'silverman' or a scalar factor. Defaults to 'scott'.
 
     Returns:
         fig, ax : matplotlib figure and axes objects
@@ -30,18 +38,18 @@ def histogram_matplotlib(df, column_values, column_category=None, show_kde=False
         ax.hist(data, bins=BINS, alpha=ALPHA, edgecolor='black', density=(show_kde or show_density))
         
         if show_kde and len(data) > 1 and data.std() > 0:
-            x = np.linspace(data.min(), data.max(), 200)
-            kde = stats.gaussian_kde(data)
-            ax.plot(x, kde(x), linewidth=2, label='KDE')
+            x, kde = kde_engine.kde_curves([data.to_numpy()], 200, bw_method)[0]
+            ax.plot(x, kde, linewidth=2, label='KDE')
             ax.legend()
     else:
         # Multiple histograms split by category
-        categories = df[column_category].dropna().unique()
-        colors = plt.cm.tab10(np.linspace(0, 1, len(categories)))
+        groups = [(cat, values) for cat, values in aggregations.partition_by_category(df, column_category, [column_values]) if pd.notna(cat)]
+        colors = plt.cm.tab10(np.linspace(0, 1, len(groups)))
+        datas = [values[~np.isnan(values[:, 0]), 0] for _, values in groups]
+        # KDE curves of all categories computed together
+        curves = kde_engine.kde_curves(datas, 200, bw_method) if show_kde else None
         
-        for cat, color in zip(categories, colors):
-            data = df[df[column_category] == cat][column_values].dropna()
-            
+        for i, ((cat, _), data, color) in enumerate(zip(groups, datas, colors)):
             if len(data) < 2:
                 continue
                 
@@ -49,9 +57,8 @@ def histogram_matplotlib(df, column_values, column_category=None, show_kde=False
                     label=str(cat), color=color, density=(show_kde or show_density))
             
             if show_kde and len(data) > 1 and data.std() > 0:
-                x = np.linspace(data.min(), data.max(), 200)
-                kde = stats.gaussian_kde(data)
-                ax.plot(x, kde(x), linewidth=2, color=color)
+                x, kde = curves[i]
+                ax.plot(x, kde, linewidth=2, color=color)
         
         ax.legend(title=column_category)
     
@@ -60,12 +67,13 @@ def histogram_matplotlib(df, column_values, column_category=None, show_kde=False
     ax.set_title(f'Distribution of {column_values}' + 
                  (f' by {column_category}' if column_category else ''))
     
-    plt.tight_layout()
+    fig.tight_layout()
     return fig, ax
 
 
 
-def histogram_seaborn(df, column_values, column_category=None, show_kde=False, show_density=False) -> plt.Figure:
+@instrumented(FIGURE_BUILD)
+def histogram_seaborn(df, column_values, column_category=None, show_kde=False, show_density=False, bw_method='scott') -> plt.Figure:
     """Plot histograms with optional category splitting and KDE overlay.
 
     Args:
@@ -74,6 +82,7 @@ def histogram_seaborn(df, column_values, column_category=None, show_kde=False, s
         column_category (str, optional): Name of the column to split data by categories. If None, plots single histogram.. Defaults to None.
         show_kde (bool, optional): Whether to overlay a Kernel Density Estimate curve.. Defaults to False.
         show_density (bool, optional): Whether to show density instead of frequency.. Defaults to False.
+        bw_method (str or float, optional): KDE bandwidth rule, 'scott', 'silverman' or a scalar factor. Defaults to 'scott'.
 
     Returns:
         fig, ax : matplotlib figure and axes objects
@@ -89,6 +98,7 @@ def histogram_seaborn(df, column_values, column_category=None, show_kde=False, s
         x=column_values,
         hue=column_category,
         kde=show_kde,
+        kde_kws={'bw_method': bw_method},
         stat='density' if (show_density or show_kde) else 'count',
         common_norm=False,
         bins=BINS,
@@ -102,10 +112,11 @@ def histogram_seaborn(df, column_values, column_category=None, show_kde=False, s
     ax.set_title(f'Distribution of {column_values}' + 
                  (f' by {column_category}' if column_category else ''))
     
-    plt.tight_layout()
+    fig.tight_layout()
     return fig, ax
 
-def histogram_plotly(df, column_values, column_category=None, show_kde=False, show_density=False) -> plt.Figure:
+@instrumented(FIGURE_BUILD)
+def histogram_plotly(df, column_values, column_category=None, show_kde=False, show_density=False, bw_method='scott', prebinned=None) -> plt.Figure:
     """Plot histograms with optional category splitting and KDE overlay.
 
     Args:
@@ -114,6 +125,9 @@ def histogram_plotly(df, column_values, column_category=None, show_kde=False, sh
         column_category (str, optional): Name of the column to split data by categories. If None, plots single histogram.. Defaults to None.
         show_kde (bool, optional): Whether to overlay a Kernel Density Estimate curve.. Defaults to False.
         show_density (bool, optional): Whether to show density instead of frequency.. Defaults to False.
+        bw_method (str or float, optional): KDE bandwidth rule, 'scott', 'silverman' or a scalar factor. Defaults to 'scott'.
+        prebinned (bool, optional): Compute the bins with NumPy and send only bar heights instead of raw rows.
+            Defaults to None, which prebins when the dataframe has more than PREBIN_ROWS rows.
 
     Returns:
         fig: plotly figure object
@@ -124,38 +138,59 @@ def histogram_plotly(df, column_values, column_category=None, show_kde=False, sh
     HEIGHT = 600
     
     histnorm = 'probability density' if show_density else None
+    title = f'Distribution of {column_values}' + (f' by {column_category}' if column_category else '')
+    if prebinned is None:
+        prebinned = df.shape[0] > PREBIN_ROWS
     
-    fig = px.histogram(
-        df,
-        x=column_values,
-        color=column_category,
-        nbins=BINS,
-        opacity=OPACITY,
-        histnorm=histnorm,
-        barmode='overlay',
-        title=f'Distribution of {column_values}' + (f' by {column_category}' if column_category else '')
-    )
+    if prebinned:
+        # Figure size depends on the number of bins, not on the number of rows
+        categories, heights, edges = aggregations.histogram_by_category(df, column_values, column_category, BINS, show_density)
+        colors = px.colors.qualitative.Plotly
+        fig = go.Figure()
+        for i, cat in enumerate(categories):
+            fig.add_trace(go.Bar(
+                x=(edges[:-1] + edges[1:]) / 2,
+                y=heights[i],
+                width=np.diff(edges),
+                name=str(cat),
+                opacity=OPACITY,
+                showlegend=column_category is not None,
+                marker=dict(color=colors[i % len(colors)])
+            ))
+        fig.update_layout(barmode='overlay', title=title, legend_title=column_category)
+    else:
+        fig = px.histogram(
+            df,
+            x=column_values,
+            color=column_category,
+            nbins=BINS,
+            opacity=OPACITY,
+            histnorm=histnorm,
+            barmode='overlay',
+            title=title
+        )
     
     if show_kde:
         if column_category is None:
             data = df[column_values].dropna()
             if len(data) > 1 and data.std() > 0:
-                x_range = np.linspace(data.min(), data.max(), 200)
-                kde = stats.gaussian_kde(data)
-                fig.add_trace(go.Scatter(x=x_range, y=kde(x_range), mode='lines', name='KDE'))
+                x_range, kde = kde_engine.kde_curves([data.to_numpy()], 200, bw_method)[0]
+                fig.add_trace(go.Scatter(x=x_range, y=kde, mode='lines', name='KDE'))
         else:
-            categories = df[column_category].dropna().unique()
+            groups = [(cat, values) for cat, values in aggregations.partition_by_category(df, column_category, [column_values]) if pd.notna(cat)]
             colors = px.colors.qualitative.Plotly
             
-            for i, cat in enumerate(categories):
-                data = df[df[column_category] == cat][column_values].dropna()
+            datas = [values[~np.isnan(values[:, 0]), 0] for _, values in groups]
+            # KDE curves of all categories computed together
+            curves = kde_engine.kde_curves(datas, 200, bw_method)
+            
+            for i, ((cat, _), data) in enumerate(zip(groups, datas)):
                 if len(data) > 1 and data.std() > 0:
-                    x_range = np.linspace(data.min(), data.max(), 200)
-                    kde = stats.gaussian_kde(data)
+                    x_range, kde = curves[i]
                     color = colors[i % len(colors)]
                     fig.add_trace(go.Scatter(
                         x=x_range, 
-                        y=kde(x_range), 
+                        y=kde, 
                         mode='lines', 
                         name=f'{cat} KDE',
                         line=dict(color=color)
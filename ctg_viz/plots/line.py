@@ -1,8 +1,10 @@
 import matplotlib.pyplot as plt
 import seaborn as sns
 import plotly.express as px
+from ctg_viz.instrumentation import instrumented, FIGURE_BUILD
 
 # line chart using matplotlib
+@instrumented(FIGURE_BUILD)
 def line_matplotlib(df, columns, column_index=None) -> plt.Figure:
     """Plots a line chart using matplotlib library
 
@@ -34,6 +36,7 @@ def line_matplotlib(df, columns, column_index=None) -> plt.Figure:
     return fig, ax
 
 # line chart using seaborn
+@instrumented(FIGURE_BUILD)
 def line_seaborn(df, columns, column_index=None) -> plt.Figure:
     """Plots a line chart using seaborn library
 
@@ -65,6 +68,7 @@ def line_seaborn(df, columns, column_index=None) -> plt.Figure:
     return fig, ax
 
 # line chart using plotly
+@instrumented(FIGURE_BUILD)
 def line_plotly(df, columns, column_index=None) -> plt.Figure:
     """Plots a line chart using plotly library
 
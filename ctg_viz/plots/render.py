@@ -0,0 +1,146 @@
+import importlib
+import io
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from ctg_viz.instrumentation import phase, LAYOUT
+
+class ChartSpec:
+    """One chart to render: a ctg_viz.plots function and the arguments it is called with.
+
+    Args:
+        function (callable or str): Plot function, or its name relative to ctg_viz.plots such as 'heatmap.corr_heatmap_plotly'
+        args (tuple, optional): Positional arguments, usually starting with the dataframe. Defaults to ().
+        kwargs (dict, optional): Keyword arguments. Defaults to None.
+        name (str, optional): Name of the chart in the results. Defaults to the function name.
+        key (hashable, optional): Identifies the inputs of the chart, so a ChartCache can reuse its result. Defaults to None (never reused).
+    """
+    def __init__(self, function, args=(), kwargs=None, name=None, key=None):
+        self.function = function
+        self.key = key
+        self.args = tuple(args)
+        self.kwargs = dict(kwargs or {})
+        self.name = name if name is not None else (function if isinstance(function, str) else function.__name__)
+
+    def resolve(self):
+        """Return the plot function, importing it when given by name."""
+        if not isinstance(self.function, str):
+            return self.function
+        module_name, function_name = self.function.rsplit('.', 1)
+        module = importlib.import_module(f'ctg_viz.plots.{module_name}')
+        return getattr(module, function_name)
+
+class ChartResult:
+    """Figure of a rendered chart.
+
+    Attributes:
+        name (str): Name of the chart spec
+        figure (matplotlib.figure.Figure or plotly.graph_objects.Figure): Figure returned by the plot function
+        image (bytes): PNG of matplotlib figures when rendered, else None
+        seconds (float): Time spent computing the data, building and rendering the figure
+    """
+    def __init__(self, name, figure, image, seconds):
+        self.name = name
+        self.figure = figure
+        self.image = image
+        self.seconds = seconds
+
+    def __repr__(self):
+        return f'ChartResult({self.name!r}, {self.seconds:.3f}s)'
+
+class ChartCache:
+    """Results of recently rendered charts keyed on ChartSpec.key, least recently used first.
+
+    Args:
+        max_size (int, optional): Results kept. Defaults to 64.
+    """
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self._results = OrderedDict()
+
+    def get(self, key):
+        """Cached result for a key, or None."""
+        if key is None or key not in self._results:
+            return None
+        self._results.move_to_end(key)
+        return self._results[key]
+
+    def put(self, key, result):
+        """Store a result, dropping the least recently used one when full."""
+        if key is None:
+            return
+        self._results[key] = result
+        if len(self._results) > self.max_size:
+            self._results.popitem(last=False)
+
+def _render_one(spec, render=True, dpi=100) -> ChartResult:
+    """Build one chart and, for matplotlib, draw it on an Agg canvas into a PNG."""
+    start = time.perf_counter()
+    output = spec.resolve()(*spec.args, **spec.kwargs)
+    # Matplotlib functions return the figure or a (figure, axes) pair
+    figure = output[0] if isinstance(output, tuple) else output
+
+    image = None
+    if render and isinstance(figure, Figure):
+        if not isinstance(figure.canvas, FigureCanvasAgg):
+            FigureCanvasAgg(figure)
+        buffer = io.BytesIO()
+        with phase(f'{spec.name}.savefig', LAYOUT):
+            figure.savefig(buffer, format='png', dpi=dpi)
+        image = buffer.getvalue()
+        # Figures stay usable but are no longer kept alive by pyplot
+        plt.close(figure)
+    return ChartResult(spec.name, figure, image, time.perf_counter() - start)
+
+def _use_agg():
+    matplotlib.use('Agg')
+
+def render_charts(specs, executor='thread', max_workers=None, render=True, dpi=100, cache=None) -> list:
+    """Build and render several charts concurrently, so the total time is close to the slowest chart.
+
+    Threads share the aggregation cache and need no copies of the data, but need a
+    non-interactive matplotlib backend (Agg, as used by Streamlit and scripts). Processes use
+    Agg in every worker and pickle the arguments and figures, which pays off for charts
+    dominated by Python-level work.
+
+    Args:
+        specs (list): ChartSpec objects
+        executor (str, optional): 'thread', 'process' or 'serial'. Defaults to 'thread'.
+        max_workers (int, optional): Workers of the pool. Defaults to one per chart, at most the number of cores.
+        render (bool, optional): Draw matplotlib figures into PNG bytes inside the workers. Defaults to True.
+        dpi (int, optional): Resolution of the PNG images. Defaults to 100.
+        cache (ChartCache, optional): Reuse the results of specs whose key was already rendered, and store the new ones. Defaults to None.
+
+    Returns:
+        list: ChartResult objects in the order of specs
+    """
+    if executor not in ['thread', 'process', 'serial']:
+        raise ValueError("Invalid executor. Possible values are 'thread', 'process' or 'serial'")
+    specs = list(specs)
+    results = [cache.get(spec.key) if cache is not None else None for spec in specs]
+    pending = [i for i, result in enumerate(results) if result is None]
+
+    if executor == 'serial' or len(pending) <= 1:
+        for i in pending:
+            results[i] = _render_one(specs[i], render, dpi)
+    else:
+        max_workers = max_workers or min(len(pending), os.cpu_count() or 1)
+        if executor == 'thread':
+            pool = ThreadPoolExecutor(max_workers=max_workers)
+        else:
+            pool = ProcessPoolExecutor(max_workers=max_workers, initializer=_use_agg)
+        with pool:
+            futures = {i: pool.submit(_render_one, specs[i], render, dpi) for i in pending}
+            for i, future in futures.items():
+                results[i] = future.result()
+
+    if cache is not None:
+        for i in pending:
+            cache.put(specs[i].key, results[i])
+    return results
@@ -1,16 +1,42 @@
 import matplotlib.pyplot as plt
+import matplotlib.colors as mcolors
+import numpy as np
 import seaborn as sns
 import plotly.express as px
+import plotly.graph_objects as go
+from ctg_viz.plots import aggregations
+from ctg_viz.instrumentation import instrumented, FIGURE_BUILD
+
+# Above this number of points the scatter is drawn as a binned image instead of individual markers
+MAX_POINTS = 200_000
+BINS = 200
+
+def _binned_rgba(counts, colors) -> np.ndarray:
+    """Blend per-category counts (categories, bins x, bins y) into an RGBA image (bins y, bins x, 4)."""
+    total = counts.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shares = np.where(total > 0, counts / total, 0.0)
+    rgb = np.tensordot(shares, np.asarray(colors)[:, :3], axes=(0, 0))
+    alpha = np.log1p(total) / np.log1p(total.max()) if total.max() > 0 else np.zeros_like(total, dtype='float64')
+    return np.dstack([rgb, alpha]).transpose(1, 0, 2)
 
 # scatter chart using matplotlib
-def scatter_matplotlib(df, column_x, column_y, column_category) -> plt.Figure:
+@instrumented(FIGURE_BUILD)
+def scatter_matplotlib(df, column_x, column_y, column_category, max_points=MAX_POINTS, bins=BINS, x_range=None, y_range=None) -> plt.Figure:
     """Plots a scatter chart using matplotlib library
 
+    With more than max_points rows the points are aggregated on a bins x bins grid per category
+    and drawn as one image, colored by category mix and shaded by log density.
+
     Args:
         df (pandas.DataFrame): Dataframe with data to plot
         column_x (str): Column with values to be plotted on the x axis
         column_y (str): Column with values to be plotted on the y axis
         column_category (str): Column with values to group by category
+        max_points (int, optional): Maximum number of rows drawn as individual points. Defaults to MAX_POINTS.
+        bins (int, optional): Bins per axis of the aggregated image. Defaults to BINS.
+        x_range (tuple, optional): (min, max) visible on the x axis, the image is re-aggregated on it. Defaults to None.
+        y_range (tuple, optional): (min, max) visible on the y axis, the image is re-aggregated on it. Defaults to None.
 
     Returns:
         plt.Figure: Returns a matplotlib Figure object
@@ -18,20 +44,31 @@ def scatter_matplotlib(df, column_x, column_y, column_category) -> plt.Figure:
     figsize=(8, 6)
     fig, ax = plt.subplots(figsize=figsize)
     
-    categories = df[column_category].unique()
-    for category in categories:
-        subset = df[df[column_category] == category]
-        ax.scatter(subset[column_x], subset[column_y], label=category, alpha=0.7)
+    if df.shape[0] > max_points:
+        categories, counts, x_edges, y_edges = aggregations.binned_counts_2d(df, column_x, column_y, column_category, bins, x_range, y_range)
+        colors = [mcolors.to_rgba(f'C{i}') for i in range(len(categories))]
+        ax.imshow(_binned_rgba(counts, colors), origin='lower', aspect='auto', interpolation='nearest',
+                  extent=(x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]))
+        for category, color in zip(categories, colors):
+            ax.scatter([], [], color=color, label=category)
+    else:
+        for category, values in aggregations.partition_by_category(df, column_category, [column_x, column_y]):
+            ax.scatter(values[:, 0], values[:, 1], label=category, alpha=0.7)
+        if x_range is not None:
+            ax.set_xlim(x_range)
+        if y_range is not None:
+            ax.set_ylim(y_range)
     
     ax.set_xlabel(column_x)
     ax.set_ylabel(column_y)
     ax.set_title(f'Scatter Plot of {column_y} vs {column_x} by {column_category}')
     ax.legend()
     
-    plt.tight_layout()
+    fig.tight_layout()
     return fig, ax
 
 # scatter chart using seaborn
+@instrumented(FIGURE_BUILD)
 def scatter_seaborn(df, column_x, column_y, column_category) -> plt.Figure:
     """Plots a scatter chart using seaborn library
 
@@ -54,28 +91,62 @@ def scatter_seaborn(df, column_x, column_y, column_category) -> plt.Figure:
     ax.set_title(f'Scatter Plot of {column_y} vs {column_x} by {column_category}')
     ax.legend()
     
-    plt.tight_layout()
+    fig.tight_layout()
     return fig, ax
 
 # scatter chart using plotly
-def scatter_plotly(df, column_x, column_y, column_category) -> plt.Figure:
+@instrumented(FIGURE_BUILD)
+def scatter_plotly(df, column_x, column_y, column_category, max_points=MAX_POINTS, bins=BINS, x_range=None, y_range=None) -> plt.Figure:
     """Plots a scatter chart using plotly library
 
+    With more than max_points rows the points are aggregated on a bins x bins grid per category
+    and sent as one heatmap layer per category, so the figure size depends on bins instead of rows.
+
     Args:
         df (pandas.DataFrame): Dataframe with data to plot
         column_x (str): Column with values to be plotted on the x axis
         column_y (str): Column with values to be plotted on the y axis
         column_category (str): Column with values to group by category
+        max_points (int, optional): Maximum number of rows drawn as individual points. Defaults to MAX_POINTS.
+        bins (int, optional): Bins per axis of the aggregated layers. Defaults to BINS.
+        x_range (tuple, optional): (min, max) visible on the x axis, the layers are re-aggregated on it. Defaults to None.
+        y_range (tuple, optional): (min, max) visible on the y axis, the layers are re-aggregated on it. Defaults to None.
 
     Returns:
         plt.Figure: Returns a matplotlib Figure object
     """
+    title = f'Scatter Plot of {column_y} vs {column_x} by {column_category}'
+    if df.shape[0] > max_points:
+        categories, counts, x_edges, y_edges = aggregations.binned_counts_2d(df, column_x, column_y, column_category, bins, x_range, y_range)
+        x_centers = (x_edges[:-1] + x_edges[1:]) / 2
+        y_centers = (y_edges[:-1] + y_edges[1:]) / 2
+        colors = px.colors.qualitative.Plotly
+
+        fig = go.Figure()
+        for i, category in enumerate(categories):
+            color = colors[i % len(colors)]
+            density = np.log1p(counts[i].T.astype('float64'))
+            density[density == 0] = np.nan
+            fig.add_trace(go.Heatmap(
+                x=x_centers, y=y_centers, z=density, name=str(category), opacity=0.7, showscale=False,
+                colorscale=[[0, 'rgba(255,255,255,0)'], [1, color]], hovertemplate='count: %{customdata}<extra>%{fullData.name}</extra>',
+                customdata=counts[i].T
+            ))
+            # Heatmaps have no legend entry, an empty marker trace stands in for the category
+            fig.add_trace(go.Scatter(x=[None], y=[None], mode='markers', marker=dict(color=color), name=str(category)))
+        fig.update_layout(title=title, xaxis_title=column_x, yaxis_title=column_y, legend_title=column_category)
+        return fig
+
     fig = px.scatter(
         df,
         x=column_x,
         y=column_y,
         color=column_category,
-        title=f'Scatter Plot of {column_y} vs {column_x} by {column_category}',
+        title=title,
         labels={column_x: column_x, column_y: column_y}
     )
+    if x_range is not None:
+        fig.update_xaxes(range=list(x_range))
+    if y_range is not None:
+        fig.update_yaxes(range=list(y_range))
     return fig
@@ -1,15 +1,21 @@
 import matplotlib.pyplot as plt
+import numpy as np
 import seaborn as sns
 import plotly.express as px
+from ctg_viz.plots import aggregations
+from ctg_viz.plots import kde as kde_engine
+from ctg_viz.instrumentation import instrumented, FIGURE_BUILD
 
 # violin chart using matplotlib only
-def violin_matplotlib(df, column_values, column_category) -> plt.Figure:
+@instrumented(FIGURE_BUILD)
+def violin_matplotlib(df, column_values, column_category, bw_method='scott') -> plt.Figure:
     """Plots a violin chart using matplotlib library
 
     Args:
         df (pandas.DataFrame): Dataframe with data to plot
         column_values (str): Column with values to be used for densities
         column_category (str): Column with values to group by category
+        bw_method (str or float, optional): KDE bandwidth rule, 'scott', 'silverman' or a scalar factor. Defaults to 'scott'.
 
     Returns:
         plt.Figure: Returns a matplotlib Figure object
@@ -17,19 +23,27 @@ def violin_matplotlib(df, column_values, column_category) -> plt.Figure:
     figsize=(8, 6)
     fig, ax = plt.subplots(figsize=figsize)
     
-    data_to_plot = [df[df[column_category] == cat][column_values].dropna() for cat in df[column_category].unique()]
-    ax.violinplot(data_to_plot, showmeans=False, showmedians=True)
-    ax.set_xticks(range(1, len(df[column_category].unique()) + 1))
-    ax.set_xticklabels(df[column_category].unique())
+    groups = aggregations.partition_by_category(df, column_category, [column_values])
+    data_to_plot = [values[~np.isnan(values[:, 0]), 0] for _, values in groups]
+    # Violin shapes for all categories come from one binned KDE pass instead of a gaussian_kde per category
+    vpstats = [
+        {'coords': coords, 'vals': vals, 'mean': np.mean(data), 'median': np.median(data),
+         'min': np.min(data), 'max': np.max(data), 'quantiles': np.empty(0)}
+        for data, (coords, vals) in zip(data_to_plot, kde_engine.kde_curves(data_to_plot, 100, bw_method))
+    ]
+    ax.violin(vpstats, showmeans=False, showmedians=True)
+    ax.set_xticks(range(1, len(groups) + 1))
+    ax.set_xticklabels([cat for cat, _ in groups])
     
     ax.set_xlabel(column_category)
     ax.set_ylabel(column_values)
     ax.set_title(f'Violin Plot of {column_values} by {column_category}')
     
-    plt.tight_layout()
+    fig.tight_layout()
     return fig, ax
 
 # violin chart using seaborn 
+@instrumented(FIGURE_BUILD)
 def violin_seaborn(df, column_values, column_category) -> plt.Figure:
     """Plots a violin chart using seaborn library
 
@@ -50,10 +64,11 @@ def violin_seaborn(df, column_values, column_category) -> plt.Figure:
     ax.set_ylabel(column_values)
     ax.set_title(f'Violin Plot of {column_values} by {column_category}')
     
-    plt.tight_layout()
+    fig.tight_layout()
     return fig, ax
 
 # violin chart using plotly 
+@instrumented(FIGURE_BUILD)
 def violin_plotly(df, column_values, column_category) -> plt.Figure:
     """Plots a violin chart using plotly library
 
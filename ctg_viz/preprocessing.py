@@ -1,100 +1,692 @@
 import pandas as pd
 from sklearn.impute import KNNImputer
 from scipy import stats
+from scipy.spatial import KDTree
+from concurrent.futures import ThreadPoolExecutor
+import json
+import time
+import warnings
 import numpy as np
+from ctg_viz.streaming import RunningMoments, QuantileSketch
+from ctg_viz.instrumentation import instrumented, DATA_PREP
+from ctg_viz.parallel import map_column_blocks, resolve_jobs
+
+def _columns_of_types(df, include) -> pd.Index:
+    """Columns of df with the given dtypes, as select_dtypes but without copying the data."""
+    return df.iloc[:0].select_dtypes(include=include).columns
+
+# Cells checked per isna() call by _null_ratio, about 1 MB of booleans
+NULL_RATIO_BLOCK_CELLS = 1 << 20
+
+def _select_columns(df, keep) -> pd.DataFrame:
+    """Dataframe with the columns of df where the boolean mask keep is True, sharing their memory with df.
+
+    take and loc copy the whole block of a consolidated frame, so the kept columns are collected
+    with items(), which yields views without looking each label up.
+    """
+    keep = np.asarray(keep, dtype=bool)
+    if df.columns.has_duplicates:
+        return df.loc[:, keep]
+    return pd.DataFrame({col: column for (col, column), kept in zip(df.items(), keep) if kept}, index=df.index, copy=False)
+
+def _null_ratio(df, block_cells=NULL_RATIO_BLOCK_CELLS) -> np.ndarray:
+    """Null ratio of every column, checking blocks of columns so the isna() frame never holds more than block_cells values."""
+    step = max(1, block_cells // max(1, df.shape[0]))
+    ratios = [df.iloc[:, start:start + step].isna().mean().to_numpy(dtype='float64') for start in range(0, df.shape[1], step)]
+    return np.concatenate(ratios) if ratios else np.empty(0, dtype='float64')
 
 # Delete columns with more than 20% missing values
-def drop_columns_with_missing_values(df, threshold=0.2) -> pd.DataFrame:
+@instrumented(DATA_PREP)
+def drop_columns_with_missing_values(df, threshold=0.2, return_columns=False, inplace=False) -> pd.DataFrame:
     """Delete columns that have more than a threshold percentage of nulls
 
+    The kept columns are not copied: the returned dataframe shares them with df.
+
     Args:
         dataframe (pd.DataFrame): Dataframe
         threshold (float, optional): Minimum value of nulls ration for columns to be droped. Defaults to 0.2.
+        return_columns (bool, optional): Return only the pd.Index of columns to keep instead of a new dataframe. Defaults to False.
+        inplace (bool, optional): Delete the columns from df itself and return it. Defaults to False.
     """
-    columns_to_drop = []
+    mask_keep = _null_ratio(df) <= threshold
+    if return_columns:
+        return df.columns[mask_keep]
+    if inplace:
+        for col in df.columns[~mask_keep].unique():
+            del df[col]
+        return df
+    return _select_columns(df, mask_keep)
 
-    for col in df.columns:
-        if df[col].isnull().mean() > threshold:
-            columns_to_drop.append(col)
+@instrumented(DATA_PREP)
+def drop_columns_with_missing_values_csv(path, threshold=0.2, chunksize=100_000, **read_csv_kwargs) -> list:
+    """Find the columns of a CSV file to keep, computing null ratios while reading it in chunks.
 
-    columns_to_keep = [col for col in df.columns if col not in columns_to_drop]
-    return df[columns_to_keep]
+    The result can be passed to pd.read_csv(path, usecols=...) to load only the kept columns.
 
-def imput_values(df, numeric_strategy='median') -> pd.DataFrame:
-    """Imput missing values with median, mean or knn for numeric columns and mode for categorical columns
+    Args:
+        path (str): Path to the CSV file.
+        threshold (float, optional): Minimum value of nulls ration for columns to be droped. Defaults to 0.2.
+        chunksize (int, optional): Rows read per chunk. Defaults to 100_000.
+        **read_csv_kwargs: Extra arguments passed to pd.read_csv.
+
+    Returns:
+        list: Columns with a null ratio less than or equal to threshold.
+    """
+    null_counts = None
+    total_rows = 0
+    for chunk in pd.read_csv(path, chunksize=chunksize, **read_csv_kwargs):
+        chunk_nulls = chunk.isna().sum()
+        null_counts = chunk_nulls if null_counts is None else null_counts + chunk_nulls
+        total_rows += chunk.shape[0]
+
+    if null_counts is None:
+        return []
+    if total_rows == 0:
+        return null_counts.index.tolist()
+    null_ratio = null_counts / total_rows
+    return null_ratio.index[null_ratio <= threshold].tolist()
+
+def _knn_impute_fast(values, n_neighbors=5, n_jobs=1, block_size=1024) -> np.ndarray:
+    """Fill NaN in a 2D float array with the mean of the nearest complete rows.
+
+    Rows are grouped by their missing pattern; for each pattern a KD-tree is built over the
+    complete rows using only the columns observed in that pattern, and only the incomplete
+    rows are queried, in blocks spread over a thread pool.
 
     Args:
-        dataframe (pd.DataFrame): Dataframe
-        numeric_strategy (str, optional): Strategy to imput numeric columns. Defaults to 'median' for numerical and 'mode' for categorical. Possible values are 'mean', 'median','mode' and 'knn'.
+        values (np.ndarray): 2D float array with NaN for missing values.
+        n_neighbors (int, optional): Number of neighbors used to fill each value. Defaults to 5.
+        n_jobs (int, optional): Number of threads, -1 uses all cores. Defaults to 1.
+        block_size (int, optional): Rows queried per task. Defaults to 1024.
+
+    Returns:
+        np.ndarray: Array with the missing values filled.
     """
-    df_inputed = df.copy(deep=True) 
-    if numeric_strategy not in ['mean', 'median', 'knn']:
-        raise ValueError("Invalid numeric_strategy. Possible values are 'mean', 'median', and 'knn'.")
+    max_workers = resolve_jobs(n_jobs)
+    values = values.copy()
+    missing = np.isnan(values)
+    complete = ~missing.any(axis=1)
+    donors = values[complete]
+    missing_rows = np.flatnonzero(~complete)
+    if missing_rows.size == 0:
+        return values
 
-    numeric_cols = df_inputed.select_dtypes(include=['number']).columns
-    categorical_cols = df_inputed.select_dtypes(include=['object', 'category']).columns
+    if donors.shape[0] == 0:
+        print('No complete rows to use as neighbors, using column means')
+        values[missing] = np.take(np.nanmean(values, axis=0), np.nonzero(missing)[1])
+        return values
+    column_means = donors.mean(axis=0)
 
-    print('Numeric columns to impute:', numeric_cols.tolist())
-    print('Categorical columns to impute:', categorical_cols.tolist())
+    k = min(n_neighbors, donors.shape[0])
+    patterns, inverse = np.unique(missing[missing_rows], axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+
+    tasks = []
+    for pattern_idx, pattern in enumerate(patterns):
+        rows = missing_rows[inverse == pattern_idx]
+        observed = ~pattern
+        if not observed.any():
+            values[np.ix_(rows, pattern)] = column_means[pattern]
+            continue
+        tree = KDTree(donors[:, observed])
+        for start in range(0, rows.size, block_size):
+            tasks.append((tree, rows[start:start + block_size], observed, pattern))
+
+    def query_block(task):
+        tree, rows, observed, pattern = task
+        _, neighbors = tree.query(values[np.ix_(rows, observed)], k=k)
+        neighbors = neighbors.reshape(rows.size, k)
+        return rows, pattern, donors[:, pattern][neighbors].mean(axis=1)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for rows, pattern, fill in executor.map(query_block, tasks):
+            values[np.ix_(rows, pattern)] = fill
+
+    return values
+
+def _fill_value(column, value):
+    """Fill value cast to the dtype of a numpy float column, so filling does not upcast float32 columns."""
+    if isinstance(column.dtype, np.dtype) and column.dtype.kind == 'f':
+        return column.dtype.type(value)
+    return value
+
+def _assign_filled(df, columns, values):
+    """Write the imputed 2D array back to the columns that had missing values, keeping their dtype."""
+    if values.shape[1] != len(columns):
+        raise ValueError(f'Imputed {values.shape[1]} columns out of {len(columns)}, columns with only missing values cannot be imputed')
+    for i, col in enumerate(columns):
+        if not df[col].hasnans:
+            continue
+        dtype = df[col].dtype
+        # Float columns keep their precision, other dtypes cannot hold the fills and become float64 as before
+        df[col] = values[:, i].astype(dtype) if isinstance(dtype, np.dtype) and dtype.kind == 'f' else values[:, i]
+
+def _fill_values_block(values, numeric_strategy='median') -> np.ndarray:
+    """Mean or median of every column of a 2D float array, NaN for columns without values."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmean(values, axis=0) if numeric_strategy == 'mean' else np.nanmedian(values, axis=0)
+
+def _impute_inplace(df, numeric_cols, categorical_cols, numeric_strategy='median', n_neighbors=5, n_jobs=1, block_size=1024):
+    """Fill missing values of the given columns of df in place, as described in imput_values.
+
+    Only the columns with missing values are rewritten, and they keep their dtype when it can hold the fill values.
+    """
+    numeric_cols = list(numeric_cols)
 
     # Impute numeric columns
-    if numeric_strategy in ['mean', 'median']:
+    if numeric_strategy in ['mean', 'median'] and n_jobs != 1:
+        # Fill values of the columns with missing values computed by column blocks in worker processes
+        missing_cols = [col for col in numeric_cols if df[col].hasnans]
+        blocks = map_column_blocks(_fill_values_block, df, missing_cols, n_jobs, numeric_strategy=numeric_strategy)
+        fill_values = np.concatenate(blocks) if blocks else []
+        for col, impute_value in zip(missing_cols, fill_values):
+            df[col] = df[col].fillna(_fill_value(df[col], impute_value))
+    elif numeric_strategy in ['mean', 'median']:
         for col in numeric_cols:
+            if not df[col].hasnans:
+                continue
             if numeric_strategy == 'mean':
-                impute_value = df_inputed[col].mean()
+                impute_value = df[col].mean()
             if numeric_strategy == 'median':
-                impute_value = df_inputed[col].median()
-            df_inputed[col] = df_inputed[col].fillna(impute_value)
+                impute_value = df[col].median()
+            df[col] = df[col].fillna(_fill_value(df[col], impute_value))
     elif numeric_strategy == 'knn':
-        imputer = KNNImputer()
+        imputer = KNNImputer(n_neighbors=n_neighbors)
         print('Using KNN Imputer for numeric columns')
-        df_inputed[numeric_cols] = imputer.fit_transform(df_inputed[numeric_cols])
+        _assign_filled(df, numeric_cols, imputer.fit_transform(df[numeric_cols]))
+    elif numeric_strategy == 'knn_fast':
+        print('Using KD-tree KNN imputation for numeric columns')
+        values = df[numeric_cols].to_numpy(dtype='float64', na_value=np.nan)
+        _assign_filled(df, numeric_cols, _knn_impute_fast(values, n_neighbors, n_jobs, block_size))
 
     # Impute categorical columns
     for col in categorical_cols:
-        mode_value = df_inputed[col].mode()[0]
-        df_inputed[col] = df_inputed[col].fillna(mode_value)
+        if not df[col].hasnans:
+            continue
+        mode_value = df[col].mode()[0]
+        df[col] = df[col].fillna(mode_value)
 
-    return df_inputed
+@instrumented(DATA_PREP)
+def imput_values(df, numeric_strategy='median', n_neighbors=5, n_jobs=1, block_size=1024, inplace=False) -> pd.DataFrame:
+    """Imput missing values with median, mean or knn for numeric columns and mode for categorical columns
 
-# Remove outliers with IQR or z-score, both methods for numeric columns
-def remove_outliers(df, columns=[], method='iqr', z_threshold=3.0) -> pd.DataFrame:
-    """Remove outliers from numeric columns using IQR or z-score method
+    Only the columns with missing values are rewritten; when inplace is False the other columns of
+    the returned dataframe share memory with the input, which is left unchanged.
 
     Args:
         dataframe (pd.DataFrame): Dataframe
-        method (str, optional): Method to remove outliers. Defaults to 'iqr'. Possible values are 'iqr' and 'zscore'.
-        z_threshold (float, optional): Z-score threshold to identify outliers. Defaults to 3.0.
+        numeric_strategy (str, optional): Strategy to imput numeric columns. Defaults to 'median' for numerical and 'mode' for categorical. Possible values are 'mean', 'median', 'knn' and 'knn_fast'.
+        n_neighbors (int, optional): Neighbors used by 'knn' and 'knn_fast'. Defaults to 5.
+        n_jobs (int, optional): Threads used by 'knn_fast' to query the KD-tree, or worker processes computing the 'mean' and 'median'
+            fills of frames with many columns (see parallel.map_column_blocks), -1 uses all cores. Defaults to 1.
+        block_size (int, optional): Rows per query block for 'knn_fast'. Defaults to 1024.
+        inplace (bool, optional): Fill the columns of df directly and return it. Defaults to False.
     """
-    df_threatment = df.copy(deep=True)
-    initial_rows = df_threatment.shape[0]
+    if numeric_strategy not in ['mean', 'median', 'knn', 'knn_fast']:
+        raise ValueError("Invalid numeric_strategy. Possible values are 'mean', 'median', 'knn' and 'knn_fast'.")
+    resolve_jobs(n_jobs)
+    df_inputed = df if inplace else df.copy(deep=False)
+
+    numeric_cols = _columns_of_types(df_inputed, ['number'])
+    categorical_cols = _columns_of_types(df_inputed, ['object', 'category'])
+
+    print('Numeric columns to impute:', numeric_cols.tolist())
+    print('Categorical columns to impute:', categorical_cols.tolist())
+
+    _impute_inplace(df_inputed, numeric_cols, categorical_cols, numeric_strategy, n_neighbors, n_jobs, block_size)
+
+    return df_inputed
+
+class ValueImputer:
+    """Imputer that learns fill values once and applies them to new batches.
+
+    Numeric columns are filled with their median or mean and categorical columns with their mode,
+    the same rules used by imput_values. The learned values can be saved to a small JSON file and
+    loaded back, so later batches do not need the historical data.
+
+    Args:
+        numeric_strategy (str, optional): Strategy for numeric columns. Possible values are 'mean' and 'median'. Defaults to 'median'.
+    """
+    def __init__(self, numeric_strategy='median'):
+        if numeric_strategy not in ['mean', 'median']:
+            raise ValueError("Invalid numeric_strategy. Possible values are 'mean' and 'median'.")
+        self.numeric_strategy = numeric_strategy
+        self.fill_values = {}
+
+    @instrumented(DATA_PREP)
+    def fit(self, df) -> 'ValueImputer':
+        """Learn the fill value of each numeric and categorical column.
+
+        Args:
+            df (pd.DataFrame): Dataframe used to compute the fill values.
+
+        Returns:
+            ValueImputer: The fitted imputer.
+        """
+        # One column at a time, so the numeric columns are not copied into a single block
+        self.fill_values = {}
+        for col in _columns_of_types(df, ['number']):
+            value = df[col].mean() if self.numeric_strategy == 'mean' else df[col].median()
+            if pd.notna(value):
+                self.fill_values[col] = value
+        for col in _columns_of_types(df, ['object', 'category']):
+            mode = df[col].mode()
+            if not mode.empty:
+                self.fill_values[col] = mode.iloc[0]
+        return self
+
+    @instrumented(DATA_PREP)
+    def transform(self, df, inplace=False) -> pd.DataFrame:
+        """Fill missing values with the learned values.
 
+        Only columns that have missing values are rewritten; when inplace is False the other
+        columns of the returned dataframe share memory with the input.
+
+        Args:
+            df (pd.DataFrame): Dataframe to fill.
+            inplace (bool, optional): Modify df directly instead of returning a new dataframe. Defaults to False.
+
+        Returns:
+            pd.DataFrame: Dataframe with missing values filled.
+        """
+        df_inputed = df if inplace else df.copy(deep=False)
+        for col, value in self.fill_values.items():
+            if col in df_inputed.columns and df_inputed[col].hasnans:
+                df_inputed[col] = df_inputed[col].fillna(_fill_value(df_inputed[col], value))
+        return df_inputed
+
+    def fit_transform(self, df, inplace=False) -> pd.DataFrame:
+        """Fit the imputer on df and fill its missing values.
+
+        Args:
+            df (pd.DataFrame): Dataframe
+            inplace (bool, optional): Modify df directly instead of returning a new dataframe. Defaults to False.
+
+        Returns:
+            pd.DataFrame: Dataframe with missing values filled.
+        """
+        return self.fit(df).transform(df, inplace=inplace)
+
+    def save(self, path):
+        """Save the learned fill values to a JSON file.
+
+        Fill values are stored as [column, value] pairs, so column labels keep their type (numbers stay numbers).
+
+        Args:
+            path (str): Destination file.
+        """
+        fill_values = [[_json_scalar(col), _json_scalar(value)] for col, value in self.fill_values.items()]
+        with open(path, 'w') as f:
+            json.dump({'numeric_strategy': self.numeric_strategy, 'fill_values': fill_values}, f, indent=2)
+
+    @classmethod
+    def load(cls, path) -> 'ValueImputer':
+        """Load an imputer saved with save.
+
+        Args:
+            path (str): JSON file written by save.
+
+        Returns:
+            ValueImputer: Imputer with the stored fill values.
+        """
+        with open(path) as f:
+            state = json.load(f)
+        imputer = cls(state['numeric_strategy'])
+        # JSON turns tuples (MultiIndex labels) into lists
+        imputer.fill_values = {tuple(col) if isinstance(col, list) else col: value for col, value in state['fill_values']}
+        return imputer
+
+def _json_scalar(value):
+    """Python value of a numpy scalar (or of each item of a tuple label), so it can be written as JSON."""
+    if isinstance(value, tuple):
+        return [_json_scalar(item) for item in value]
+    return value.item() if isinstance(value, np.generic) else value
+
+def _outlier_columns(df, columns=None) -> list:
+    """Numeric columns (all of them if columns is empty) with more than one unique value."""
     if columns:
-        numeric_cols = df_threatment[columns].select_dtypes(include=['number']).columns
+        numeric_cols = [col for col in columns if pd.api.types.is_numeric_dtype(df[col])]
     else:
-        numeric_cols = df_threatment.select_dtypes(include=['number']).columns
-    
-    # Ommit columns with single unique value
-    numeric_cols = [col for col in numeric_cols if df_threatment[col].nunique() > 1]
+        numeric_cols = _columns_of_types(df, ['number'])
 
+    # Ommit columns with single unique value, found from min and max without hashing the values
+    outlier_cols = []
+    for col in numeric_cols:
+        lowest, highest = df[col].min(), df[col].max()
+        if pd.notna(lowest) and lowest < highest:
+            outlier_cols.append(col)
+    return outlier_cols
+
+def _outlier_block(values, method='iqr', z_threshold=3.0) -> tuple:
+    """Mask of the rows of a 2D float array inside the bounds of every column, and the rows flagged by each column."""
     if method == 'iqr':
-        for col in numeric_cols:
-            Q1 = df_threatment[col].quantile(0.25)
-            Q3 = df_threatment[col].quantile(0.75)
+        Q1, Q3 = np.nanquantile(values, [0.25, 0.75], axis=0).reshape(2, -1)
+        IQR = Q3 - Q1
+        # NaN compares as False, so rows with missing values are removed as in sequential mode
+        with np.errstate(invalid='ignore'):
+            mask_by_column = (values >= Q1 - 1.5 * IQR) & (values <= Q3 + 1.5 * IQR)
+    elif method == 'zscore':
+        z_scores = stats.zscore(values, axis=0)
+        with np.errstate(invalid='ignore'):
+            mask_by_column = np.abs(z_scores) < z_threshold
+    return mask_by_column.all(axis=1), (~mask_by_column).sum(axis=0)
+
+def _outlier_mask(df, columns=None, method='iqr', z_threshold=3.0, block_columns=8, n_jobs=1):
+    """Boolean mask of the rows of df without outliers, with bounds of all columns computed on the full data.
+
+    Columns are converted to float64 by blocks of block_columns, so only one block is copied at a time.
+    With n_jobs, the blocks of wide frames are split between worker processes instead.
+
+    Returns:
+        tuple: (np.ndarray mask of rows to keep, dict with the number of rows flagged by each column)
+    """
+    numeric_cols = _outlier_columns(df, columns)
+    blocks = map_column_blocks(_outlier_block, df, numeric_cols, n_jobs, block_columns if n_jobs == 1 else None,
+                               method=method, z_threshold=z_threshold)
+    mask = np.ones(df.shape[0], dtype=bool)
+    for block_mask, _ in blocks:
+        mask &= block_mask
+    rows_flagged = dict(zip(numeric_cols, [int(count) for _, counts in blocks for count in counts]))
+    return mask, rows_flagged
+
+def _sequential_outlier_mask(df, numeric_cols, method='iqr', z_threshold=3.0) -> np.ndarray:
+    """Boolean mask of the rows kept when filtering column by column, with the bounds of each column computed on the rows left by the previous ones.
+
+    Only one column is converted at a time and rows are never copied, the mask is narrowed instead.
+    """
+    keep = np.ones(df.shape[0], dtype=bool)
+    for col in numeric_cols:
+        rows = np.flatnonzero(keep)
+        column = df[col].iloc[rows]
+        if method == 'iqr':
+            Q1 = column.quantile(0.25)
+            Q3 = column.quantile(0.75)
             IQR = Q3 - Q1
             lower_bound = Q1 - 1.5 * IQR
             upper_bound = Q3 + 1.5 * IQR
-            
-            df_threatment = df_threatment[(df_threatment[col] >= lower_bound) & (df_threatment[col] <= upper_bound)]
-            
-    elif method == 'zscore':
-        for col in numeric_cols:
-            z_scores = stats.zscore(df_threatment[col])
+            keep[rows] = ((column >= lower_bound) & (column <= upper_bound)).to_numpy()
+        else:
+            z_scores = stats.zscore(column)
+            keep[rows] = np.asarray(np.abs(z_scores) < z_threshold)
+    return keep
+
+# Remove outliers with IQR or z-score, both methods for numeric columns
+@instrumented(DATA_PREP)
+def remove_outliers(df, columns=[], method='iqr', z_threshold=3.0, mode='vectorized', return_summary=False, inplace=False, n_jobs=1) -> pd.DataFrame:
+    """Remove outliers from numeric columns using IQR or z-score method
+
+    Both modes compute a mask of the rows to keep without copying df, and only the kept rows are copied once at the end.
+
+    Args:
+        dataframe (pd.DataFrame): Dataframe
+        method (str, optional): Method to remove outliers. Defaults to 'iqr'. Possible values are 'iqr' and 'zscore'.
+        z_threshold (float, optional): Z-score threshold to identify outliers. Defaults to 3.0.
+        mode (str, optional): 'vectorized' computes the bounds of all columns on the full data and filters once with a single mask.
+            'sequential' filters column by column, recomputing the bounds on the rows left by previous columns, so results depend on column order. Defaults to 'vectorized'.
+        return_summary (bool, optional): Return a (dataframe, summary) tuple instead of printing the rows removed. Defaults to False.
+        inplace (bool, optional): Drop the outlier rows from df itself and return it, df must have a unique index. Defaults to False.
+        n_jobs (int, optional): Worker processes computing the bounds of frames with many columns in 'vectorized' mode, -1 uses all cores. Defaults to 1.
+    """
+    if method not in ['iqr', 'zscore']:
+        raise ValueError("Invalid method. Possible values are 'iqr' and 'zscore'.")
+    if mode not in ['vectorized', 'sequential']:
+        raise ValueError("Invalid mode. Possible values are 'vectorized' and 'sequential'.")
+    if inplace and not df.index.is_unique:
+        raise ValueError("inplace needs a dataframe with a unique index, use inplace=False.")
+
+    initial_rows = df.shape[0]
 
-            mask_remove_outliers = np.abs(z_scores) < z_threshold
-            df_threatment = df_threatment[mask_remove_outliers]
+    if mode == 'vectorized':
+        mask, rows_flagged = _outlier_mask(df, columns, method, z_threshold, n_jobs=n_jobs)
+    else:
+        rows_flagged = {}
+        mask = _sequential_outlier_mask(df, _outlier_columns(df, columns), method, z_threshold)
+
+    if inplace:
+        df.drop(index=df.index[~mask], inplace=True)
+        df_threatment = df
+    else:
+        df_threatment = df[mask]
 
     rows_removed = initial_rows - df_threatment.shape[0]
-    print(f'Rows deleted: {rows_removed} ({(rows_removed / initial_rows) * 100:.2f}%)')
-    
+    summary = {
+        'initial_rows': initial_rows,
+        'rows_removed': rows_removed,
+        'percent_removed': (rows_removed / initial_rows) * 100 if initial_rows else 0.0,
+        'rows_flagged_by_column': rows_flagged,
+    }
+
+    if return_summary:
+        return df_threatment, summary
+
+    print(f'Rows deleted: {rows_removed} ({summary["percent_removed"]:.2f}%)')
     return df_threatment
+
+class StreamingOutlierFilter:
+    """Outlier filter for data that arrives in chunks, using the IQR or z-score rules of remove_outliers.
+
+    Quartiles are tracked with a quantile sketch and z-scores with running moments, one per column,
+    so the bounds can be updated without keeping past chunks. After `warmup_rows` rows the bounds
+    can be frozen and later chunks are only checked against them.
+
+    Args:
+        columns (list, optional): Numeric columns to check. Defaults to the numeric columns of the first chunk.
+        method (str, optional): Method to detect outliers. Possible values are 'iqr' and 'zscore'. Defaults to 'iqr'.
+        z_threshold (float, optional): Z-score threshold to identify outliers. Defaults to 3.0.
+        warmup_rows (int, optional): Freeze the bounds once this many rows have been seen. Defaults to None (never freeze).
+        sketch_capacity (int, optional): Size of each level of the quantile sketches. Defaults to 1024.
+    """
+    def __init__(self, columns=None, method='iqr', z_threshold=3.0, warmup_rows=None, sketch_capacity=1024):
+        if method not in ['iqr', 'zscore']:
+            raise ValueError("Invalid method. Possible values are 'iqr' and 'zscore'.")
+        self.columns = list(columns) if columns else None
+        self.method = method
+        self.z_threshold = z_threshold
+        self.warmup_rows = warmup_rows
+        self.sketch_capacity = sketch_capacity
+        self.frozen = False
+        self.rows_seen = 0
+        self.rows_flagged = 0
+        self._moments = None
+        self._sketches = None
+
+    def _init_columns(self, chunk):
+        if self.columns is None:
+            self.columns = _columns_of_types(chunk, ['number']).tolist()
+        self._moments = RunningMoments(len(self.columns))
+        self._sketches = [QuantileSketch(self.sketch_capacity) for _ in self.columns]
+
+    def update(self, chunk) -> 'StreamingOutlierFilter':
+        """Add a chunk to the statistics used for the bounds. Does nothing once frozen.
+
+        Args:
+            chunk (pd.DataFrame): New rows.
+
+        Returns:
+            StreamingOutlierFilter: The updated filter.
+        """
+        if self._moments is None:
+            self._init_columns(chunk)
+        if self.frozen:
+            return self
+
+        values = chunk[self.columns].to_numpy(dtype='float64', na_value=np.nan)
+        self._moments.update(values)
+        if self.method == 'iqr':
+            for i, sketch in enumerate(self._sketches):
+                sketch.update(values[:, i])
+        self.rows_seen += chunk.shape[0]
+
+        if self.warmup_rows is not None and self.rows_seen >= self.warmup_rows:
+            self.freeze()
+        return self
+
+    def freeze(self) -> 'StreamingOutlierFilter':
+        """Stop updating the bounds with new chunks.
+
+        Returns:
+            StreamingOutlierFilter: The frozen filter.
+        """
+        self.frozen = True
+        return self
+
+    def bounds(self) -> pd.DataFrame:
+        """Current lower and upper bound of each column.
+
+        Columns with a single value seen so far get infinite bounds, as remove_outliers omits them.
+
+        Returns:
+            pd.DataFrame: Dataframe indexed by column with 'lower' and 'upper' bounds.
+        """
+        if self.method == 'iqr':
+            quartiles = np.array([sketch.quantile([0.25, 0.75]) for sketch in self._sketches]).reshape(-1, 2)
+            IQR = quartiles[:, 1] - quartiles[:, 0]
+            lower = quartiles[:, 0] - 1.5 * IQR
+            upper = quartiles[:, 1] + 1.5 * IQR
+        else:
+            # Population std (ddof=0), as stats.zscore in remove_outliers
+            with np.errstate(divide='ignore', invalid='ignore'):
+                std = np.sqrt(self._moments.m2 / self._moments.count)
+            lower = self._moments.mean - self.z_threshold * std
+            upper = self._moments.mean + self.z_threshold * std
+
+        single_valued = ~(self._moments.max > self._moments.min)
+        lower = np.where(single_valued, -np.inf, lower)
+        upper = np.where(single_valued, np.inf, upper)
+        return pd.DataFrame({'lower': lower, 'upper': upper}, index=self.columns)
+
+    def flag(self, chunk) -> pd.Series:
+        """Update the statistics with a chunk and flag its outlier rows.
+
+        Rows with missing values in the checked columns are flagged, as remove_outliers drops them.
+
+        Args:
+            chunk (pd.DataFrame): New rows.
+
+        Returns:
+            pd.Series: Boolean series aligned with chunk, True for outlier rows.
+        """
+        self.update(chunk)
+        bounds = self.bounds()
+        values = chunk[self.columns].to_numpy(dtype='float64', na_value=np.nan)
+        with np.errstate(invalid='ignore'):
+            if self.method == 'iqr':
+                inside = (values >= bounds['lower'].to_numpy()) & (values <= bounds['upper'].to_numpy())
+            else:
+                inside = (values > bounds['lower'].to_numpy()) & (values < bounds['upper'].to_numpy())
+        is_outlier = ~inside.all(axis=1)
+        self.rows_flagged += int(is_outlier.sum())
+        return pd.Series(is_outlier, index=chunk.index, name='is_outlier')
+
+    def filter(self, chunk) -> pd.DataFrame:
+        """Update the statistics with a chunk and return it without its outlier rows.
+
+        Args:
+            chunk (pd.DataFrame): New rows.
+
+        Returns:
+            pd.DataFrame: Chunk without outliers.
+        """
+        return chunk[~self.flag(chunk).to_numpy()]
+
+class PreprocessingPipeline:
+    """Chain of preprocessing steps recorded lazily and executed as one fused plan.
+
+    Steps are recorded with the methods named after the preprocessing functions and run in the
+    same order by run. Column drops only narrow the set of columns carried forward, imputation
+    only rewrites the kept columns that have missing values, and rows are copied once, by the
+    first outlier removal. Columns that no step changes are shared with the input dataframe
+    instead of being copied. The timing and shape after each step are kept in `report`.
+
+    Example:
+        pipeline = PreprocessingPipeline().drop_columns_with_missing_values(0.2).imput_values('median').remove_outliers(method='iqr')
+        df_clean = pipeline.run(df)
+        pipeline.report
+    """
+    def __init__(self):
+        self.steps = []
+        self.report = None
+
+    def drop_columns_with_missing_values(self, threshold=0.2) -> 'PreprocessingPipeline':
+        """Record a drop_columns_with_missing_values step."""
+        self.steps.append(('drop_columns_with_missing_values', {'threshold': threshold}))
+        return self
+
+    def imput_values(self, numeric_strategy='median', n_neighbors=5, n_jobs=1, block_size=1024) -> 'PreprocessingPipeline':
+        """Record an imput_values step."""
+        if numeric_strategy not in ['mean', 'median', 'knn', 'knn_fast']:
+            raise ValueError("Invalid numeric_strategy. Possible values are 'mean', 'median', 'knn' and 'knn_fast'.")
+        self.steps.append(('imput_values', {'numeric_strategy': numeric_strategy, 'n_neighbors': n_neighbors,
+                                            'n_jobs': n_jobs, 'block_size': block_size}))
+        return self
+
+    def remove_outliers(self, columns=[], method='iqr', z_threshold=3.0, n_jobs=1) -> 'PreprocessingPipeline':
+        """Record a remove_outliers step, always in 'vectorized' mode.
+
+        Columns dropped by earlier steps are not checked, and the step removes nothing when none of its columns are left.
+        """
+        if method not in ['iqr', 'zscore']:
+            raise ValueError("Invalid method. Possible values are 'iqr' and 'zscore'.")
+        self.steps.append(('remove_outliers', {'columns': list(columns), 'method': method, 'z_threshold': z_threshold, 'n_jobs': n_jobs}))
+        return self
+
+    @instrumented(DATA_PREP)
+    def run(self, df) -> pd.DataFrame:
+        """Execute the recorded steps on df. The input dataframe is never modified, and the
+        result shares the columns no step changed with it.
+
+        Args:
+            df (pd.DataFrame): Dataframe
+
+        Returns:
+            pd.DataFrame: Preprocessed dataframe.
+        """
+        work = df
+        owned = False
+        columns = df.columns.tolist()
+        report = []
+
+        for name, params in self.steps:
+            start = time.perf_counter()
+
+            if name == 'drop_columns_with_missing_values':
+                null_ratio = _null_ratio(_select_columns(work, work.columns.isin(columns)))
+                columns = [col for col, ratio in zip(columns, null_ratio) if ratio <= params['threshold']]
+
+            elif name == 'imput_values':
+                if not owned:
+                    work = _select_columns(work, work.columns.isin(columns))
+                    owned = True
+                numeric_cols = [col for col in columns if pd.api.types.is_numeric_dtype(work[col])]
+                categorical_cols = [col for col in columns if isinstance(work[col].dtype, pd.CategoricalDtype)
+                                    or pd.api.types.is_object_dtype(work[col]) or pd.api.types.is_string_dtype(work[col])]
+                _impute_inplace(work, numeric_cols, categorical_cols, **params)
+
+            elif name == 'remove_outliers':
+                # Only kept columns are checked, work may still hold the columns dropped by earlier steps
+                if params['columns']:
+                    outlier_columns = [col for col in params['columns'] if col in columns]
+                else:
+                    outlier_columns = [col for col in columns if pd.api.types.is_numeric_dtype(work[col])]
+                # An empty list would make _outlier_mask check every numeric column, nothing is left to check so the step is skipped
+                if outlier_columns:
+                    mask, _ = _outlier_mask(work, outlier_columns, params['method'], params['z_threshold'], n_jobs=params['n_jobs'])
+                    # Filtering produces a new frame, which doubles as the single copy of the pipeline
+                    work = work.loc[mask, columns] if not owned else work[mask]
+                    owned = True
+
+            report.append({
+                'Step': name,
+                'Seconds': time.perf_counter() - start,
+                'Rows': work.shape[0],
+                'Columns': len(columns),
+            })
+
+        if not owned:
+            work = _select_columns(work, work.columns.isin(columns))
+        elif len(columns) != work.shape[1]:
+            work = _select_columns(work, work.columns.isin(columns))
+
+        self.report = pd.DataFrame(report, columns=['Step', 'Seconds', 'Rows', 'Columns'])
+        return work
@@ -0,0 +1,204 @@
+"""Render a set of ctg_viz charts from a data file into a static HTML report.
+
+Usage:
+    python -m ctg_viz.report data/CTG.csv charts.json --output report --jobs 4 --incremental
+
+The spec is a JSON (or YAML, if PyYAML is installed) document such as:
+    {"title": "CTG batch",
+     "charts": [{"name": "b_by_dp", "function": "boxplots.boxplot_plotly", "args": ["b", "DP"]},
+                {"function": "heatmap.corr_heatmap_matplotlib", "args": [["b", "e", "LB"]], "kwargs": {"correlation_method": "spearman"}}]}
+Every function is named relative to ctg_viz.plots and gets the data as its first argument.
+"""
+import argparse
+import base64
+import hashlib
+import html
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+from ctg_viz import loader
+from ctg_viz.parallel import resolve_jobs
+from ctg_viz.plots import aggregations, render
+
+MANIFEST_NAME = 'manifest.json'
+
+# Data of the worker process, loaded once by _init_worker
+_DATA = None
+
+def load_spec(path) -> dict:
+    """Read a chart spec from a JSON or YAML file.
+
+    Args:
+        path (str): Path to the spec, YAML if it ends with .yaml or .yml
+
+    Returns:
+        dict: Spec with a 'charts' list, each chart with a unique 'name'
+    """
+    with open(path) as file:
+        if os.path.splitext(path)[1].lower() in ['.yaml', '.yml']:
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is needed for YAML specs, install it or use a JSON spec")
+            spec = yaml.safe_load(file)
+        else:
+            spec = json.load(file)
+
+    charts = []
+    for i, chart in enumerate(spec.get('charts', [])):
+        if 'function' not in chart:
+            raise ValueError(f"Chart {i} of {path} has no 'function'")
+        name = chart.get('name', f"{i:02d}_{chart['function'].rsplit('.', 1)[-1]}")
+        charts.append({'name': name, 'function': chart['function'], 'args': list(chart.get('args', [])), 'kwargs': dict(chart.get('kwargs', {}))})
+    names = [chart['name'] for chart in charts]
+    if len(set(names)) < len(names):
+        raise ValueError(f"Chart names of {path} must be unique")
+    return {'title': spec.get('title', 'Report'), 'charts': charts}
+
+def _referenced_columns(df, value) -> list:
+    """Columns of df named by a chart argument (a column name or a list of them)."""
+    values = value if isinstance(value, (list, tuple)) else [value]
+    return [item for item in values if isinstance(item, str) and item in df.columns]
+
+def chart_fingerprint(df, chart) -> str:
+    """Fingerprint of a chart spec and of the data of the columns it names.
+
+    Args:
+        df (pandas.DataFrame): Data of the report
+        chart (dict): Chart of a spec from load_spec
+
+    Returns:
+        str: Hex digest that changes when the spec or the data of its columns change
+    """
+    columns = []
+    for value in [*chart['args'], *chart['kwargs'].values()]:
+        columns += [col for col in _referenced_columns(df, value) if col not in columns]
+    # Charts that name no column depend on the whole frame
+    data = aggregations.fingerprint(df, columns or list(df.columns))
+    spec = json.dumps([chart['function'], chart['args'], chart['kwargs']], sort_keys=True, default=str)
+    return hashlib.blake2b(f'{spec}|{data}'.encode(), digest_size=16).hexdigest()
+
+def _file_name(name) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', name)
+
+def _init_worker(data_path, read_csv_kwargs):
+    global _DATA
+    matplotlib.use('Agg')
+    _DATA = loader.load_data(data_path, **read_csv_kwargs)
+
+def _render_chart(chart, output_dir) -> dict:
+    """Render one chart in a worker and write it as PNG (matplotlib) or Plotly JSON."""
+    spec = render.ChartSpec(chart['function'], (_DATA, *chart['args']), chart['kwargs'], name=chart['name'])
+    result = render._render_one(spec)
+    if result.image is not None:
+        kind, file_name, content = 'png', f"{_file_name(chart['name'])}.png", result.image
+    else:
+        kind, file_name, content = 'plotly', f"{_file_name(chart['name'])}.json", result.figure.to_json().encode()
+    with open(os.path.join(output_dir, file_name), 'wb') as file:
+        file.write(content)
+    return {'kind': kind, 'file': file_name, 'seconds': result.seconds}
+
+def _write_html(path, title, charts, manifest, include_plotlyjs='cdn'):
+    """Assemble the report from the chart files listed in the manifest."""
+    if include_plotlyjs == 'inline':
+        plotly_script = f'<script type="text/javascript">{get_plotlyjs()}</script>'
+    else:
+        plotly_script = f'<script src="https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"></script>'
+
+    sections = []
+    for i, chart in enumerate(charts):
+        entry = manifest[chart['name']]
+        with open(os.path.join(os.path.dirname(path), entry['file']), 'rb') as file:
+            content = file.read()
+        if entry['kind'] == 'png':
+            body = f'<img src="data:image/png;base64,{base64.b64encode(content).decode()}">'
+        else:
+            # The figure JSON is embedded as is, escaping '</' so it cannot close the script tag
+            figure_json = content.decode().replace('</', '<\\/')
+            body = (f'<div id="chart-{i}"></div>\n'
+                    f'<script>var figure = {figure_json}; Plotly.newPlot("chart-{i}", figure.data, figure.layout);</script>')
+        sections.append(f'<section>\n<h2>{html.escape(chart["name"])}</h2>\n{body}\n</section>')
+
+    document = '\n'.join([
+        '<!DOCTYPE html>',
+        f'<html>\n<head>\n<meta charset="utf-8">\n<title>{html.escape(title)}</title>\n{plotly_script}\n</head>',
+        f'<body>\n<h1>{html.escape(title)}</h1>',
+        *sections,
+        '</body>\n</html>\n',
+    ])
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(document)
+
+def build_report(data_path, spec_path, output_dir='report', jobs=None, incremental=False, include_plotlyjs='cdn', **read_csv_kwargs) -> dict:
+    """Render every chart of a spec in worker processes and write output_dir/index.html.
+
+    Args:
+        data_path (str): CSV or Parquet file with the data
+        spec_path (str): JSON or YAML chart spec, see load_spec
+        output_dir (str, optional): Folder of the report and chart files. Defaults to 'report'.
+        jobs (int, optional): Worker processes, -1 (or None) uses all cores. Defaults to None.
+        incremental (bool, optional): Keep the files of charts whose fingerprint did not change since the last run. Defaults to False.
+        include_plotlyjs (str, optional): 'cdn' links plotly.js, 'inline' embeds it so the report works offline. Defaults to 'cdn'.
+        **read_csv_kwargs: Extra arguments passed to pd.read_csv.
+
+    Returns:
+        dict: Manifest with the kind, file, fingerprint and seconds of each chart
+    """
+    if include_plotlyjs not in ['cdn', 'inline']:
+        raise ValueError("Invalid include_plotlyjs. Possible values are 'cdn' or 'inline'")
+    n_workers = resolve_jobs(jobs)
+    spec = load_spec(spec_path)
+    os.makedirs(output_dir, exist_ok=True)
+    df = loader.load_data(data_path, **read_csv_kwargs)
+
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    previous = {}
+    if incremental and os.path.exists(manifest_path):
+        with open(manifest_path) as file:
+            previous = json.load(file)
+
+    manifest = {}
+    pending = []
+    for chart in spec['charts']:
+        fingerprint = chart_fingerprint(df, chart)
+        entry = previous.get(chart['name'])
+        if entry and entry['fingerprint'] == fingerprint and os.path.exists(os.path.join(output_dir, entry['file'])):
+            manifest[chart['name']] = entry
+        else:
+            pending.append((chart, fingerprint))
+    print(f"{len(pending)} of {len(spec['charts'])} charts to render")
+
+    start = time.perf_counter()
+    if pending:
+        max_workers = min(n_workers, len(pending))
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(data_path, read_csv_kwargs)) as pool:
+            futures = [(chart, fingerprint, pool.submit(_render_chart, chart, output_dir)) for chart, fingerprint in pending]
+            for chart, fingerprint, future in futures:
+                manifest[chart['name']] = {**future.result(), 'fingerprint': fingerprint}
+                print(f"{chart['name']}: {manifest[chart['name']]['seconds']:.2f}s")
+
+    manifest = {chart['name']: manifest[chart['name']] for chart in spec['charts']}
+    with open(manifest_path, 'w') as file:
+        json.dump(manifest, file, indent=2)
+    _write_html(os.path.join(output_dir, 'index.html'), spec['title'], spec['charts'], manifest, include_plotlyjs)
+    print(f"Report written to {os.path.join(output_dir, 'index.html')} in {time.perf_counter() - start:.2f}s")
+    return manifest
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render ctg_viz charts into a static HTML report.')
+    parser.add_argument('data', help='CSV or Parquet file with the data')
+    parser.add_argument('spec', help='JSON or YAML chart spec')
+    parser.add_argument('-o', '--output', default='report', help="Output folder (default: 'report')")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='Worker processes, -1 uses all cores (default: all cores)')
+    parser.add_argument('--incremental', action='store_true', help='Only render charts whose spec or data changed since the last run')
+    parser.add_argument('--include-plotlyjs', choices=['cdn', 'inline'], default='cdn', help="How plotly.js is included (default: 'cdn')")
+    args = parser.parse_args(argv)
+    build_report(args.data, args.spec, args.output, args.jobs, args.incremental, args.include_plotlyjs)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+import numpy as np
+
+class RunningMoments:
+    """Mergeable per-column count, mean, variance, min and max for data that arrives in chunks.
+
+    Chunk statistics are combined with the parallel form of Welford's algorithm (Chan et al.),
+    so the result does not depend on how the data was split.
+
+    Args:
+        n_columns (int): Number of columns tracked.
+    """
+    def __init__(self, n_columns):
+        self.count = np.zeros(n_columns, dtype='int64')
+        self._mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+        self.min = np.full(n_columns, np.nan)
+        self.max = np.full(n_columns, np.nan)
+
+    def update(self, values) -> 'RunningMoments':
+        """Add a 2D float block (rows x columns) with NaN for missing values.
+
+        Args:
+            values (np.ndarray): Block of new rows.
+
+        Returns:
+            RunningMoments: The updated object.
+        """
+        values = np.asarray(values, dtype='float64')
+        mask = ~np.isnan(values)
+        count = mask.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(count > 0, np.nansum(values, axis=0) / count, 0.0)
+        m2 = np.nansum((values - mean) ** 2, axis=0)
+        has_values = count > 0
+        min_val = np.full(values.shape[1], np.nan)
+        max_val = np.full(values.shape[1], np.nan)
+        if has_values.any():
+            min_val[has_values] = np.nanmin(values[:, has_values], axis=0)
+            max_val[has_values] = np.nanmax(values[:, has_values], axis=0)
+        self._combine(count, mean, m2, min_val, max_val)
+        return self
+
+    def merge(self, other) -> 'RunningMoments':
+        """Merge the statistics of another RunningMoments over the same columns.
+
+        Args:
+            other (RunningMoments): Statistics to merge.
+
+        Returns:
+            RunningMoments: The updated object.
+        """
+        self._combine(other.count, other._mean, other.m2, other.min, other.max)
+        return self
+
+    def _combine(self, count, mean, m2, min_val, max_val):
+        total = self.count + count
+        delta = mean - self._mean
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.where(total > 0, count / total, 0.0)
+        self._mean = self._mean + delta * weight
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * weight
+        self.count = total
+        self.min = np.fmin(self.min, min_val)
+        self.max = np.fmax(self.max, max_val)
+
+    @property
+    def variance(self) -> np.ndarray:
+        """Sample variance (ddof=1) of each column, NaN where fewer than two values were seen."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.count > 1, self.m2 / (self.count - 1), np.nan)
+
+    @property
+    def std(self) -> np.ndarray:
+        """Sample standard deviation (ddof=1) of each column."""
+        return np.sqrt(self.variance)
+
+    @property
+    def mean(self) -> np.ndarray:
+        """Mean of each column, NaN where no values were seen."""
+        return np.where(self.count > 0, self._mean, np.nan)
+
+class QuantileSketch:
+    """Mergeable quantile sketch with bounded memory, in the spirit of KLL.
+
+    Values are kept in levels of compactors; when a level grows past its capacity it is sorted
+    and every other item is promoted to the next level with twice the weight. While fewer than
+    `capacity` values have been added the quantiles are exact.
+
+    Args:
+        capacity (int, optional): Items kept per level before compacting. Defaults to 1024.
+        random_state (int, optional): Seed used to pick the compaction offset. Defaults to 0.
+    """
+    def __init__(self, capacity=1024, random_state=0):
+        self.capacity = capacity
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self._rng = np.random.default_rng(random_state)
+
+    def update(self, values) -> 'QuantileSketch':
+        """Add values to the sketch, ignoring NaN.
+
+        Args:
+            values (array-like): New values.
+
+        Returns:
+            QuantileSketch: The updated object.
+        """
+        values = np.asarray(values, dtype='float64').ravel()
+        values = values[~np.isnan(values)]
+        self.n += values.size
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other) -> 'QuantileSketch':
+        """Merge another sketch into this one.
+
+        Args:
+            other (QuantileSketch): Sketch to merge.
+
+        Returns:
+            QuantileSketch: The updated object.
+        """
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if items.size > self.capacity:
+                items = np.sort(items)
+                # Odd leftover item stays on this level so no weight is lost
+                keep = items[-1:] if items.size % 2 else items[:0]
+                paired = items[:items.size - keep.size]
+                offset = self._rng.integers(2)
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], paired[offset::2]])
+                self.levels[level] = keep
+            level += 1
+
+    def quantile(self, q) -> float:
+        """Estimate the q-th quantile of the values added so far.
+
+        Args:
+            q (float or array-like): Quantile(s) between 0 and 1.
+
+        Returns:
+            float: Estimated quantile(s), NaN if the sketch is empty.
+        """
+        if self.n == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(level.size, 2.0 ** i) for i, level in enumerate(self.levels)])
+        if all(level.size == 0 for level in self.levels[1:]):
+            return np.quantile(items, q)
+        order = np.argsort(items)
+        items = items[order]
+        cumulative = np.cumsum(weights[order])
+        # Midpoint ranks so a symmetric sample gives an unbiased median
+        positions = (cumulative - weights[order] / 2) / cumulative[-1]
+        return np.interp(q, positions, items)
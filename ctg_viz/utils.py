@@ -1,45 +1,194 @@
+import numpy as np
 import pandas as pd
+from ctg_viz.streaming import RunningMoments, QuantileSketch
+from ctg_viz.parallel import map_column_blocks, concat_block_results
+from ctg_viz.instrumentation import instrumented, STATISTICS
 
-def check_data_completeness_alejandro_sosa_murguia(df) -> pd.DataFrame:
-    """Generate a report of data completeness for each column in the dataframe.
+REPORT_COLUMNS = ['Column', 'Data Type', 'Non-Null Count', 'Null Count', 'Completeness (%)', 'Mean', 'Median', 'Std Dev', 'Min', 'Max']
+
+def _numeric_block_stats(values, approximate_median=False, median_sample_size=100_000, random_state=0) -> dict:
+    """Compute count, mean, median, std, min and max for every column of a 2D float array in one batched pass.
 
     Args:
-        df (pd.DataFrame): Input dataframe.
+        values (np.ndarray): 2D float array (rows x columns) with NaN for missing values.
+        approximate_median (bool, optional): Estimate the median from a random sample of rows. Defaults to False.
+        median_sample_size (int, optional): Rows sampled when approximate_median is True. Defaults to 100_000.
+        random_state (int, optional): Seed for the median sample. Defaults to 0.
 
     Returns:
-        pd.DataFrame: Dataframe containing completeness report.
+        dict: Arrays of statistics keyed by 'count', 'mean', 'median', 'std', 'min' and 'max'.
     """
-    columns = ['Column', 'Data Type', 'Non-Null Count', 'Null Count', 'Completeness (%)', 'Mean', 'Median', 'Std Dev', 'Min', 'Max']
-    report = []
+    n_cols = values.shape[1]
+    mask = ~np.isnan(values)
+    count = mask.sum(axis=0)
+    has_values = count > 0
 
-    total_rows = df.shape[0]
+    mean = np.full(n_cols, np.nan)
+    std = np.full(n_cols, np.nan)
+    median = np.full(n_cols, np.nan)
+    min_val = np.full(n_cols, np.nan)
+    max_val = np.full(n_cols, np.nan)
+
+    if has_values.any():
+        block = values[:, has_values]
+        block_count = count[has_values]
+
+        mean[has_values] = np.nansum(block, axis=0) / block_count
+        squared_dev = np.nansum((block - mean[has_values]) ** 2, axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std[has_values] = np.where(block_count > 1, np.sqrt(squared_dev / (block_count - 1)), np.nan)
+        min_val[has_values] = np.nanmin(block, axis=0)
+        max_val[has_values] = np.nanmax(block, axis=0)
+
+        if approximate_median and block.shape[0] > median_sample_size:
+            rng = np.random.default_rng(random_state)
+            rows = rng.choice(block.shape[0], size=median_sample_size, replace=False)
+            block = block[rows]
+        sampled_has_values = (~np.isnan(block)).any(axis=0)
+        sampled_median = np.full(block.shape[1], np.nan)
+        if sampled_has_values.any():
+            sampled_median[sampled_has_values] = np.nanmedian(block[:, sampled_has_values], axis=0)
+        median[has_values] = sampled_median
+
+    return {
+        'count': count,
+        'mean': mean,
+        'median': median,
+        'std': std,
+        'min': min_val,
+        'max': max_val,
+    }
+
+def _build_completeness_report(columns, dtypes, non_null_counts, total_rows, numeric_stats) -> pd.DataFrame:
+    """Assemble the completeness report from precomputed per-column statistics.
 
-    for col in df.columns:
-        non_null_count = df[col].count()
-        null_count = total_rows - non_null_count
-        completeness = (non_null_count / total_rows) * 100
-        data_type = df[col].dtype
-
-        if pd.api.types.is_numeric_dtype(df[col]):
-            mean = df[col].mean()
-            median = df[col].median()
-            std_dev = df[col].std()
-            min_val = df[col].min()
-            max_val = df[col].max()
-        else:
-            mean = median = std_dev = min_val = max_val = None
+    Args:
+        columns (list): Column names in report order.
+        dtypes (list): Data type of each column.
+        non_null_counts (list): Non-null count of each column.
+        total_rows (int): Number of rows of the profiled data.
+        numeric_stats (dict): Maps numeric column names to a dict with 'mean', 'median', 'std', 'min' and 'max'.
 
+    Returns:
+        pd.DataFrame: Dataframe containing completeness report.
+    """
+    report = []
+    for col, data_type, non_null_count in zip(columns, dtypes, non_null_counts):
+        stats = numeric_stats.get(col)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            completeness = (np.float64(non_null_count) / total_rows) * 100
         report.append({
             'Column': col,
             'Data Type': data_type,
             'Non-Null Count': non_null_count,
-            'Null Count': null_count,
+            'Null Count': total_rows - non_null_count,
             'Completeness (%)': completeness,
-            'Mean': mean,
-            'Median': median,
-            'Std Dev': std_dev,
-            'Min': min_val,
-            'Max': max_val
+            'Mean': stats['mean'] if stats else None,
+            'Median': stats['median'] if stats else None,
+            'Std Dev': stats['std'] if stats else None,
+            'Min': stats['min'] if stats else None,
+            'Max': stats['max'] if stats else None
         })
 
-    return pd.DataFrame(report, columns=columns)
+    return pd.DataFrame(report, columns=REPORT_COLUMNS)
+
+@instrumented(STATISTICS)
+def check_data_completeness_alejandro_sosa_murguia(df, approximate_median=False, median_sample_size=100_000, n_jobs=1) -> pd.DataFrame:
+    """Generate a report of data completeness for each column in the dataframe.
+
+    Statistics for all numeric columns are computed together over a single float block
+    instead of one column and one statistic at a time. With n_jobs, wide frames are split in
+    column blocks processed by worker processes (see parallel.map_column_blocks).
+
+    Args:
+        df (pd.DataFrame): Input dataframe.
+        approximate_median (bool, optional): Estimate medians from a random sample of rows, useful for very large frames. Defaults to False.
+        median_sample_size (int, optional): Rows sampled when approximate_median is True. Defaults to 100_000.
+        n_jobs (int, optional): Worker processes for frames with many numeric columns, -1 uses all cores. Defaults to 1.
+
+    Returns:
+        pd.DataFrame: Dataframe containing completeness report.
+    """
+    total_rows = df.shape[0]
+    non_null_counts = df.count().tolist()
+
+    numeric_cols = [col for col, dtype in df.dtypes.items() if pd.api.types.is_numeric_dtype(dtype)]
+    numeric_stats = {}
+    if numeric_cols and n_jobs != 1:
+        block_stats = concat_block_results(map_column_blocks(_numeric_block_stats, df, numeric_cols, n_jobs,
+                                                             approximate_median=approximate_median, median_sample_size=median_sample_size))
+    elif numeric_cols:
+        values = df[numeric_cols].to_numpy(dtype='float64', na_value=np.nan)
+        block_stats = _numeric_block_stats(values, approximate_median, median_sample_size)
+    if numeric_cols:
+        numeric_stats = {
+            col: {name: block_stats[name][i] for name in ('mean', 'median', 'std', 'min', 'max')}
+            for i, col in enumerate(numeric_cols)
+        }
+
+    return _build_completeness_report(df.columns.tolist(), df.dtypes.tolist(), non_null_counts, total_rows, numeric_stats)
+
+@instrumented(STATISTICS)
+def check_data_completeness_csv(path, chunksize=100_000, sketch_capacity=1024, **read_csv_kwargs) -> pd.DataFrame:
+    """Generate the completeness report of a CSV file reading it in chunks, without loading the whole file.
+
+    Counts, mean, standard deviation, min and max are merged exactly across chunks. The median
+    comes from a bounded-memory quantile sketch and is exact while a column has at most
+    `sketch_capacity` values.
+
+    Args:
+        path (str): Path to the CSV file.
+        chunksize (int, optional): Rows read per chunk. Defaults to 100_000.
+        sketch_capacity (int, optional): Size of each level of the median sketch. Defaults to 1024.
+        **read_csv_kwargs: Extra arguments passed to pd.read_csv.
+
+    Returns:
+        pd.DataFrame: Dataframe containing completeness report.
+    """
+    columns = None
+    total_rows = 0
+
+    for chunk in pd.read_csv(path, chunksize=chunksize, **read_csv_kwargs):
+        if columns is None:
+            columns = chunk.columns.tolist()
+            chunk_dtypes = [[] for _ in columns]
+            non_null_counts = np.zeros(len(columns), dtype='int64')
+            moments = RunningMoments(len(columns))
+            sketches = [QuantileSketch(sketch_capacity) for _ in columns]
+
+        total_rows += chunk.shape[0]
+        non_null_counts += chunk.count().to_numpy()
+
+        is_numeric = np.array([pd.api.types.is_numeric_dtype(dtype) for dtype in chunk.dtypes])
+        for dtypes_seen, dtype in zip(chunk_dtypes, chunk.dtypes):
+            if dtype not in dtypes_seen:
+                dtypes_seen.append(dtype)
+
+        values = np.full(chunk.shape, np.nan)
+        if is_numeric.any():
+            values[:, is_numeric] = chunk.loc[:, is_numeric].to_numpy(dtype='float64', na_value=np.nan)
+        moments.update(values)
+        for i in np.flatnonzero(is_numeric):
+            sketches[i].update(values[:, i])
+
+    if columns is None:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+
+    dtypes = []
+    numeric_stats = {}
+    for i, col in enumerate(columns):
+        numeric_dtypes = [dtype for dtype in chunk_dtypes[i] if pd.api.types.is_numeric_dtype(dtype)]
+        if len(numeric_dtypes) < len(chunk_dtypes[i]):
+            # A column is only numeric if every chunk parsed it as numeric
+            dtypes.append(next(dtype for dtype in chunk_dtypes[i] if dtype not in numeric_dtypes))
+            continue
+        dtypes.append(np.result_type(*numeric_dtypes))
+        numeric_stats[col] = {
+            'mean': moments.mean[i],
+            'median': sketches[i].quantile(0.5),
+            'std': moments.std[i],
+            'min': moments.min[i],
+            'max': moments.max[i],
+        }
+
+    return _build_completeness_report(columns, dtypes, non_null_counts.tolist(), total_rows, numeric_stats)
@@ -1,65 +1,117 @@
 import streamlit as st
-import numpy as np
-import pandas as pd
 
 # Import your plotting functions
 
-from ctg_viz.plots import histograms, boxplots, barplots, density, scatter, violin, heatmap
+from ctg_viz import categorization, filters, instrumentation, loader
+from ctg_viz.plots import histograms, boxplots, barplots, density, scatter, violin, heatmap, render
 
 
+# Timings panel: records the functions run by this rerun (charts reused from the cache are not run).
+# It is a single-user debugging aid: instrumentation is global to the process and Streamlit serves
+# every session from the same process, so while it is on, calls of other sessions are recorded too
+# and each rerun clears the records of the others
+show_timings = st.sidebar.checkbox('Show timings', help='Debugging aid for a single user: timings are recorded for the whole server process, '
+                                   'so they include the charts of other sessions running at the same time')
+if show_timings:
+    instrumentation.reset()
+    instrumentation.enable()
+
 # Load your data
 data_path = 'data/CTG.csv' # Data must be stored in the data/ folder after you download the file. You can also modify the path
-df = pd.read_csv(data_path)
-
-# Charts
-# 1.1 Histograma
-columns = ['b', 'e']
-fig_hist, ax = histograms.histogram_matplotlib(df[columns].dropna(), columns, show_density=True, show_kde=True)
-
-# 2.1 Boxplots
-category_column = 'DP'
-fig_box, ax = boxplots.boxplot_seaborn(df, 'b', category_column)
-
-# 2.2 Barplots
-category_column = 'DP'
-fig_bar = barplots.barh_plotly(df, category_column)
 
-# 3.5 Scatterplot
-column_x = 'b'
-column_y = 'e'
-fig_scatter = scatter.scatter_plotly(df, column_x, column_y, 'DP')
+@st.cache_resource
+def load_index(data_path, signature):
+    # Read once per process through a Parquet copy with compact dtypes and index it for the filters; rebuilt when the CSV changes
+    return filters.FilterIndex(loader.load_data(data_path, optimize=True, category_columns=loader.CTG_CATEGORY_COLUMNS))
+
+signature = tuple(loader.file_signature(data_path))
+index = load_index(data_path, signature)
+df = index.df
+# The loaded frame is never modified, so its classification is reused on every rerun
+column_types = categorization.classify_column_types(df, use_cache=True)
+numeric_columns = column_types['continuous_numerical'] + column_types['discrete_numerical']
+category_columns = column_types['categorical'] + column_types['discrete_numerical']
+
+def default_index(options, value):
+    return options.index(value) if value in options else 0
+
+# Selectors
+st.sidebar.header("Filters")
+column_x = st.sidebar.selectbox('Values column', numeric_columns, index=default_index(numeric_columns, 'b'))
+column_y = st.sidebar.selectbox('Second column (histogram and scatter)', numeric_columns, index=default_index(numeric_columns, 'e'))
+category_column = st.sidebar.selectbox('Category column', category_columns, index=default_index(category_columns, 'DP'))
+categories = st.sidebar.multiselect('Categories', index.categories(category_column), default=index.categories(category_column))
+windows = {}
+for column in dict.fromkeys([column_x, column_y]):
+    low, high = map(float, index.value_range(column))
+    if low < high:
+        windows[column] = st.sidebar.slider(f'{column} range', low, high, (low, high))
+heatmap_columns = st.sidebar.multiselect('Heatmap columns', numeric_columns, default=[col for col in ['b', 'e', 'LB'] if col in numeric_columns])
+corr_method = st.sidebar.selectbox('Correlation method', ['spearman', 'pearson'])
+
+# Rows are selected through the sorted indexes and category bitmaps, memoized per selection.
+# Only narrowed ranges and category subsets filter, so rows with missing values stay by default
+ranges = {column: window for column, window in windows.items() if window != tuple(map(float, index.value_range(column)))}
+category_filter = {category_column: categories} if len(categories) < len(index.categories(category_column)) else {}
+filtered = index.filter(ranges, category_filter)
+selection = (signature, tuple(sorted(ranges.items())), tuple((column, tuple(values)) for column, values in category_filter.items()))
+hist_columns = list(dict.fromkeys([column_x, column_y]))
 
-# 3.5 density
-fig_density, ax = density.density_seaborn(df, 'b', 'DP')
-
-# 3.6 density
-fig_violin, ax = violin.violin_seaborn(df, 'b', 'DP')
-
-# 3.7 density
-columns = ['b', 'e', 'LB']
-corr_method = 'spearman'
-fig_heatmap = heatmap.corr_heatmap_plotly(df, columns, corr_method)
+# Charts
+# Charts are memoized on their inputs for the whole session: only the ones whose inputs changed
+# are rebuilt, each on its own thread (matplotlib ones drawn to PNG), so a rerun takes as long
+# as the slowest changed chart
+if 'chart_cache' not in st.session_state:
+    st.session_state['chart_cache'] = render.ChartCache()
+
+specs = [
+    # 1.1 Histograma
+    render.ChartSpec(histograms.histogram_matplotlib, (filtered[hist_columns].dropna(), hist_columns), dict(show_density=True, show_kde=True),
+                     name='hist', key=('hist', selection, tuple(hist_columns))),
+    # 2.1 Boxplots
+    render.ChartSpec(boxplots.boxplot_seaborn, (filtered, column_x, category_column), name='box', key=('box', selection, column_x, category_column)),
+    # 2.2 Barplots
+    render.ChartSpec(barplots.barh_plotly, (filtered, category_column), name='bar', key=('bar', selection, category_column)),
+    # 3.5 Scatterplot
+    render.ChartSpec(scatter.scatter_plotly, (filtered, column_x, column_y, category_column), dict(x_range=ranges.get(column_x), y_range=ranges.get(column_y)),
+                     name='scatter', key=('scatter', selection, column_x, column_y, category_column)),
+    # 3.5 density
+    render.ChartSpec(density.density_seaborn, (filtered, column_x, category_column), name='density', key=('density', selection, column_x, category_column)),
+    # 3.6 density
+    render.ChartSpec(violin.violin_seaborn, (filtered, column_x, category_column), name='violin', key=('violin', selection, column_x, category_column)),
+]
+if heatmap_columns:
+    # 3.7 density
+    specs.append(render.ChartSpec(heatmap.corr_heatmap_plotly, (filtered, heatmap_columns, corr_method), name='heatmap', key=('heatmap', selection, tuple(heatmap_columns), corr_method)))
+charts = {result.name: result for result in render.render_charts(specs, cache=st.session_state['chart_cache'])}
 
 
 st.title("Multi-Library Plot Dashboard")
 
 st.header("Matplotlib Histogram")
-st.pyplot(fig_hist)
+st.image(charts['hist'].image)
 
 st.header("Seaborn Boxplot")
-st.pyplot(fig_box)
+st.image(charts['box'].image)
 
 st.header("Plotly Horizontal Bar (Interactive!)")
-st.plotly_chart(fig_bar) # use plotly_chart for plotly express
+st.plotly_chart(charts['bar'].figure) # use plotly_chart for plotly express
 
 st.header("Plotly Scatter (Interactive!)")
-st.plotly_chart(fig_scatter) # use plotly_chart for plotly express
+st.plotly_chart(charts['scatter'].figure) # use plotly_chart for plotly express
 
 st.header("Seaborn Density")
-st.pyplot(fig_density)
+st.image(charts['density'].image)
 
 st.header("Seaborn Violin")
-st.pyplot(fig_violin)
+st.image(charts['violin'].image)
+
+if 'heatmap' in charts:
+    st.header("Plotly Heatmap with correlations (Interactive!)")
+    st.plotly_chart(charts['heatmap'].figure) # use plotly_chart for plotly express
 
-st.header("Plotly Heatmap with correlations (Interactive!)")
-st.plotly_chart(fig_heatmap) # use plotly_chart for plotly express
+if show_timings:
+    instrumentation.disable()
+    st.header("Timings")
+    st.dataframe(instrumentation.phase_summary())
+    st.dataframe(instrumentation.summary())
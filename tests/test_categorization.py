@@ -0,0 +1,16 @@
+import numpy as np
+import pandas as pd
+
+from ctg_viz import categorization
+
+def test_cache_is_not_reused_for_other_content():
+    categorization.clear_classification_cache()
+    discrete = pd.DataFrame({'a': np.arange(100) % 3})
+    continuous = pd.DataFrame({'a': np.arange(100)})
+    assert categorization.classify_column_types(discrete, use_cache=True)['discrete_numerical'] == ['a']
+    assert categorization.classify_column_types(continuous, use_cache=True)['continuous_numerical'] == ['a']
+
+def test_no_cache_by_default():
+    categorization.clear_classification_cache()
+    categorization.classify_column_types(pd.DataFrame({'a': [1, 2, 3]}))
+    assert len(categorization._CLASSIFICATION_CACHE) == 0
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from scipy import stats
+
+from ctg_viz.plots import kde
+
+BW_METHODS = ['scott', 'silverman', 0.3]
+
+@pytest.fixture
+def samples():
+    rng = np.random.default_rng(0)
+    return [
+        rng.normal(0, 1, 500),
+        rng.normal(5, 0.5, 200),
+        np.concatenate([rng.gamma(2, 2, 300), [np.nan] * 10]),
+    ]
+
+def _scipy_density(sample, x, bw_method):
+    sample = sample[~np.isnan(sample)]
+    return stats.gaussian_kde(sample, bw_method=bw_method)(x)
+
+@pytest.mark.parametrize('bw_method', BW_METHODS)
+def test_binned_kde_matches_scipy(samples, bw_method):
+    x = np.linspace(-4, 15, 300)
+    densities = kde.binned_kde(samples, x, bw_method)
+    assert densities.shape == (len(samples), x.shape[0])
+    for sample, density in zip(samples, densities):
+        expected = _scipy_density(sample, x, bw_method)
+        np.testing.assert_allclose(density, expected, rtol=1e-3, atol=1e-3 * expected.max())
+
+@pytest.mark.parametrize('bw_method', BW_METHODS)
+def test_kde_curves_match_scipy(samples, bw_method):
+    curves = kde.kde_curves(samples, n_points=150, bw_method=bw_method, cut=0.5)
+    assert len(curves) == len(samples)
+    for sample, (x, density) in zip(samples, curves):
+        clean = sample[~np.isnan(sample)]
+        extra = 0.5 * (clean.max() - clean.min())
+        np.testing.assert_allclose(x, np.linspace(clean.min() - extra, clean.max() + extra, 150))
+        expected = _scipy_density(sample, x, bw_method)
+        np.testing.assert_allclose(density, expected, rtol=1e-3, atol=1e-3 * expected.max())
+
+def test_empty_samples():
+    x = np.linspace(0, 1, 10)
+    densities = kde.binned_kde([np.array([]), np.array([np.nan]), np.array([0.2, 0.5, 0.9])], x)
+    assert (densities[:2] == 0).all()
+    assert (densities[2] > 0).any()
+
+    curves = kde.kde_curves([np.array([]), np.array([0.2, 0.5, 0.9])])
+    assert curves[0][0].shape == (0,) and curves[0][1].shape == (0,)
+    assert curves[1][0].shape == (200,)
+    assert kde.kde_curves([]) == []
+    assert (kde.binned_kde([np.array([])], x) == 0).all()
+
+def test_constant_sample():
+    # scipy cannot fit a zero variance sample, the density is a spike of unit mass at the value
+    normal = np.random.default_rng(1).normal(2, 0.5, 100)
+    x = np.linspace(0, 4, 4001)
+    densities = kde.binned_kde([np.full(50, 2.0), normal], x)
+    assert np.isfinite(densities).all() and (densities >= 0).all()
+    assert x[np.argmax(densities[0])] == pytest.approx(2.0, abs=0.01)
+    assert np.trapezoid(densities[0], x) == pytest.approx(1.0, rel=1e-2)
+    # Sharing the grid with a constant sample does not change the density of the other one
+    expected = _scipy_density(normal, x, 'scott')
+    np.testing.assert_allclose(densities[1], expected, rtol=1e-3, atol=1e-3 * expected.max())
+
+    (curve_x, curve_density), = kde.kde_curves([np.full(10, 3.0)])
+    assert np.isfinite(curve_density).all()
+    assert (curve_x == 3.0).all()
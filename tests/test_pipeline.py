@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from ctg_viz.preprocessing import PreprocessingPipeline
+
+def _df():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'a': rng.normal(size=200), 'b': rng.normal(size=200)})
+    # Heavy tails in a, so outlier removal on it would drop rows
+    df.loc[::10, 'a'] = 50.0
+    df.loc[::2, 'b'] = np.nan
+    return df
+
+def test_remove_outliers_on_dropped_column_is_skipped():
+    df = _df()
+    pipeline = PreprocessingPipeline().drop_columns_with_missing_values(0.2).remove_outliers(columns=['b'])
+    result = pipeline.run(df)
+    assert result.columns.tolist() == ['a']
+    assert result.shape[0] == df.shape[0]
+
+def test_remove_outliers_all_numeric_columns_dropped():
+    df = _df()
+    df['a'] = np.nan
+    df['label'] = 'x'
+    result = PreprocessingPipeline().drop_columns_with_missing_values(0.2).remove_outliers().run(df)
+    assert result.columns.tolist() == ['label']
+    assert result.shape[0] == df.shape[0]
+
+def test_remove_outliers_only_checks_kept_columns():
+    df = _df()
+    df['c'] = 0.0
+    df.loc[::3, 'c'] = np.nan
+    df.loc[1::3, 'c'] = 1000.0
+    result = PreprocessingPipeline().drop_columns_with_missing_values(0.2).remove_outliers().run(df)
+    q1, q3 = df['a'].quantile([0.25, 0.75])
+    expected = df.loc[(df['a'] >= q1 - 1.5 * (q3 - q1)) & (df['a'] <= q3 + 1.5 * (q3 - q1)), ['a']]
+    pd.testing.assert_frame_equal(result, expected)
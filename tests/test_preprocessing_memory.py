@@ -0,0 +1,98 @@
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ctg_viz import preprocessing
+
+N_ROWS = 200_000
+N_COLUMNS = 32
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(N_ROWS, N_COLUMNS)), columns=[f'c{i}' for i in range(N_COLUMNS)])
+    df.loc[::10, 'c1'] = np.nan
+    df.loc[::7, 'c2'] = np.nan
+    # Dropped by drop_columns_with_missing_values
+    df.loc[::2, 'c3'] = np.nan
+    return df
+
+def _frame_bytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def _peak(func, *args, **kwargs):
+    """Result of func and the peak memory allocated while it ran, in bytes."""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        result = func(*args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1] - start
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+def test_drop_columns_does_not_copy(df):
+    result, peak = _peak(preprocessing.drop_columns_with_missing_values, df)
+    assert 'c3' not in result.columns
+    assert peak < 0.1 * _frame_bytes(df)
+
+@pytest.mark.parametrize('numeric_strategy', ['mean', 'median'])
+def test_imput_values_only_copies_filled_columns(df, numeric_strategy):
+    result, peak = _peak(preprocessing.imput_values, df, numeric_strategy)
+    assert not result.isna().any().any()
+    # Three columns have missing values out of 32
+    assert peak < 0.25 * _frame_bytes(df)
+
+@pytest.mark.parametrize('mode', ['vectorized', 'sequential'])
+@pytest.mark.parametrize('method', ['iqr', 'zscore'])
+def test_remove_outliers_copies_kept_rows_once(df, mode, method):
+    df = df.fillna(0.0)
+    result, peak = _peak(preprocessing.remove_outliers, df, method=method, mode=mode)
+    assert 0 < result.shape[0] < df.shape[0]
+    # The kept rows are the only copy, on top of which the mask work stays small
+    assert peak - _frame_bytes(result) < 0.35 * _frame_bytes(df)
+
+def test_pipeline_memory(df):
+    pipeline = preprocessing.PreprocessingPipeline().drop_columns_with_missing_values().imput_values().remove_outliers()
+    result, peak = _peak(pipeline.run, df)
+    assert peak - _frame_bytes(result) < 0.5 * _frame_bytes(df)
+
+def test_not_inplace_leaves_input_unchanged(df):
+    original = df.copy(deep=True)
+    preprocessing.drop_columns_with_missing_values(df)
+    preprocessing.imput_values(df, 'median')
+    preprocessing.remove_outliers(df, method='iqr')
+    preprocessing.remove_outliers(df, method='zscore', mode='sequential')
+    preprocessing.PreprocessingPipeline().drop_columns_with_missing_values().imput_values().remove_outliers().run(df)
+    pd.testing.assert_frame_equal(df, original)
+
+def test_not_inplace_results_do_not_write_to_input(df):
+    original = df.copy(deep=True)
+    result = preprocessing.imput_values(df, 'median')
+    result['c0'] = 0.0
+    result['c1'] = 0.0
+    pd.testing.assert_frame_equal(df, original)
+
+def test_inplace_returns_same_object(df):
+    expected = preprocessing.imput_values(df, 'median')
+    result = preprocessing.imput_values(df, 'median', inplace=True)
+    assert result is df
+    pd.testing.assert_frame_equal(df, expected)
+
+    expected = preprocessing.drop_columns_with_missing_values(df, threshold=0.0)
+    result = preprocessing.drop_columns_with_missing_values(df, threshold=0.0, inplace=True)
+    assert result is df
+    pd.testing.assert_frame_equal(df, expected)
+
+    expected = preprocessing.remove_outliers(df)
+    result = preprocessing.remove_outliers(df, inplace=True)
+    assert result is df
+    pd.testing.assert_frame_equal(df, expected)
+
+def test_inplace_needs_unique_index():
+    df = pd.DataFrame({'a': [1.0, 2.0, 100.0]}, index=[0, 0, 1])
+    with pytest.raises(ValueError):
+        preprocessing.remove_outliers(df, inplace=True)
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ctg_viz.preprocessing import ValueImputer, imput_values
+
+def _df():
+    return pd.DataFrame({
+        'a': [1.0, np.nan, 3.0, 10.0],
+        'b': np.array([np.nan, 2.0, 2.0, 5.0], dtype='float32'),
+        'c': [4, 5, 6, 7],
+        'label': ['x', None, 'x', 'y'],
+        'group': pd.Categorical(['u', 'v', None, 'v']),
+    })
+
+@pytest.mark.parametrize('numeric_strategy', ['median', 'mean'])
+def test_fit_transform_matches_imput_values(numeric_strategy):
+    df = _df()
+    expected = imput_values(df, numeric_strategy)
+    result = ValueImputer(numeric_strategy).fit(df).transform(df)
+    pd.testing.assert_frame_equal(result, expected)
+    # Categorical columns are filled with their mode in both strategies
+    assert result['label'].tolist() == ['x', 'x', 'x', 'y']
+    assert result['group'].tolist() == ['u', 'v', 'v', 'v']
+    # The input is left unchanged
+    assert df['a'].isna().any()
+
+def test_transform_inplace_returns_df():
+    df = _df()
+    imputer = ValueImputer().fit(df)
+    result = imputer.transform(df, inplace=True)
+    assert result is df
+    assert not df.isna().any().any()
+    assert df['b'].dtype == np.float32
+
+def test_save_load_keeps_column_labels(tmp_path):
+    df = pd.DataFrame({0: [1.0, np.nan, 3.0], 'b': [np.nan, 2.0, 2.0], 1: ['x', None, 'x']})
+    imputer = ValueImputer().fit(df)
+    path = tmp_path / 'imputer.json'
+    imputer.save(path)
+    loaded = ValueImputer.load(path)
+
+    assert loaded.fill_values == imputer.fill_values
+    pd.testing.assert_frame_equal(loaded.transform(df), imputer.transform(df))
+    assert not loaded.transform(df).isna().any().any()
+
+def test_save_load_multiindex_columns(tmp_path):
+    df = pd.DataFrame([[1.0, np.nan], [3.0, 4.0]], columns=pd.MultiIndex.from_tuples([('x', 1), ('y', 2)]))
+    path = tmp_path / 'imputer.json'
+    ValueImputer().fit(df).save(path)
+    assert not ValueImputer.load(path).transform(df).isna().any().any()